@@ -1,40 +1,61 @@
 import os
 import base64
 import time
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List
 import json
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
+import httpx
 import streamlit as st
 
-HISTORY_PATH = os.path.join(os.path.dirname(__file__), "chat_history.json")
+HISTORY_PATH = os.path.join(os.path.dirname(__file__), "chat_history.jsonl")
+STREAM_FLUSH_INTERVAL = 0.05  # seconds between placeholder re-renders while streaming
 
 def load_saved_messages() -> List[Dict[str, Any]]:
+    messages: List[Dict[str, Any]] = []
     try:
         if os.path.exists(HISTORY_PATH):
             with open(HISTORY_PATH, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                if isinstance(data, list):
-                    return [m for m in data if isinstance(m, dict) and "role" in m and "content" in m]
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        m = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(m, dict) and "role" in m and "content" in m:
+                        messages.append(m)
     except Exception:
         pass
-    return []
+    return messages
+
+@st.cache_resource
+def _history_writer() -> ThreadPoolExecutor:
+    # A single worker keeps appends (and truncation) in submission order.
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-history")
 
-def save_messages(messages: List[Dict[str, Any]]) -> None:
+def _append_line(line: str) -> None:
     try:
-        with open(HISTORY_PATH, "w", encoding="utf-8") as f:
-            json.dump(messages, f, ensure_ascii=False, indent=2)
+        with open(HISTORY_PATH, "a", encoding="utf-8") as f:
+            f.write(line)
     except Exception:
         pass
 
-st.set_page_config(
-    page_title="MEMORIRAY · Mental Health Chat",
-    page_icon="🌤️",
-    layout="centered",
-    initial_sidebar_state="collapsed",
-)
+def _truncate_history() -> None:
+    try:
+        open(HISTORY_PATH, "w").close()
+    except Exception:
+        pass
 
-st.markdown(
+def append_message(message: Dict[str, Any]) -> None:
+    _history_writer().submit(_append_line, json.dumps(message, ensure_ascii=False) + "\n")
+
+def clear_saved_messages() -> None:
+    _history_writer().submit(_truncate_history).result()
+
+# Static page chrome. Streamlit removes any element a rerun does not emit again,
+# so these are written on every run rather than guarded by session state.
+_CSS = (
     """
     <style>
       :root {
@@ -149,42 +170,56 @@ st.markdown(
       }
       ::-webkit-scrollbar-track { background: #FFF7D6; }
     </style>
-    """,
-    unsafe_allow_html=True,
+    """
 )
 
-st.markdown(
+_HERO_HTML = (
     """
     <div class="hero">
       <div class="logo"></div>
       <div class="app-title">MEMORIRAY · Mental Health Chat</div>
     </div>
     <div class="subtle">A gentle space to reflect, feel, and be heard.</div>
-    """,
-    unsafe_allow_html=True,
+    """
+)
+
+_FOOTER_HTML = (
+    '<div class="footer">This is a supportive tool and not a substitute for professional care. '
+    'If you’re in immediate danger or crisis, please contact local emergency services or a crisis hotline in your region.</div>'
 )
+
+st.set_page_config(
+    page_title="MEMORIRAY · Mental Health Chat",
+    page_icon="🌤️",
+    layout="centered",
+    initial_sidebar_state="collapsed",
+)
+
+st.markdown(_CSS, unsafe_allow_html=True)
+st.markdown(_HERO_HTML, unsafe_allow_html=True)
 st.divider()
 
 col_clear, col_export = st.columns([1,1])
 with col_clear:
     if st.button("🧹 Clear"):
         st.session_state.pop("messages", None)
-        try:
-            if os.path.exists(HISTORY_PATH):
-                os.remove(HISTORY_PATH)
-        except Exception:
-            pass
+        st.session_state.pop("_transcript_cache", None)
+        clear_saved_messages()
         st.rerun()
 with col_export:
     download_ready = st.session_state.get("messages", [])
     if download_ready:
-        transcript = ""
-        for m in download_ready:
-            role = "You" if m["role"] == "user" else "Guide"
-            transcript += f"{role}: {m['content']}\n"
+        n = len(download_ready)
+        cached = st.session_state.get("_transcript_cache")
+        if not cached or cached[0] != n:
+            transcript = "".join(
+                f"{'You' if m['role'] == 'user' else 'Guide'}: {m['content']}\n"
+                for m in download_ready
+            )
+            cached = st.session_state["_transcript_cache"] = (n, transcript.encode("utf-8"))
         st.download_button(
             "⬇️ Export",
-            data=transcript.encode("utf-8"),
+            data=cached[1],
             file_name="solace_chat.txt",
             mime="text/plain",
         )
@@ -204,45 +239,54 @@ if "messages" not in st.session_state:
             }
         ]
 
-for msg in st.session_state.messages:
-    with st.chat_message(msg["role"]):
-        st.markdown(msg["content"])
+# Prior turns render once into a stable container; the live turn is appended
+# to it below and only its reply placeholder is rewritten while streaming.
+history_box = st.container()
+with history_box:
+    for msg in st.session_state.messages:
+        with st.chat_message(msg["role"]):
+            st.markdown(msg["content"])
 
-def call_chat_api(message: str) -> Dict[str, Any]:
+@st.cache_resource
+def _http() -> httpx.Client:
+    # One pooled keep-alive client for every backend call across reruns.
+    return httpx.Client(headers={"Connection": "keep-alive"})
+
+def stream_chat_api(message: str) -> Iterator[Dict[str, Any]]:
     base = os.getenv("CHAT_API_BASE", "http://127.0.0.1:8000").rstrip("/")
     url = f"{base}/chat"
     payload = {"message": message}
-    r = requests.post(url, json=payload, timeout=60)
-    if not r.ok:
-        try:
-            detail = r.json().get("detail", r.text)
-        except Exception:
-            detail = r.text
-        raise RuntimeError(f"I'm having trouble connecting right now ({r.status_code}).")
-    data = r.json()
-    return {
-        "reply": data.get("reply", "") or "",
-        "images": data.get("images") or [],
-    }
+    with _http().stream("POST", url, json=payload, timeout=60) as r:
+        if r.is_error:
+            raise RuntimeError(f"I'm having trouble connecting right now ({r.status_code}).")
+        for line in r.iter_lines():
+            if line.startswith("data: "):
+                yield json.loads(line[len("data: "):])
 
-def call_add_memory(base_64_image: str) -> str:
+def call_add_memory_batch(uploads) -> List[str]:
     base = os.getenv("CHAT_API_BASE", "http://127.0.0.1:8000").rstrip("/")
-    url = f"{base}/add_memory"
-    payload = {"base_64_image": base_64_image}
-    r = requests.post(url, json=payload, timeout=60)
-    if not r.ok:
+    url = f"{base}/add_memory_batch"
+    files = [
+        ("images", (uf.name, uf, uf.type or "application/octet-stream"))
+        for uf in uploads
+    ]
+    r = _http().post(url, files=files, timeout=60)
+    if r.is_error:
         try:
             detail = r.json().get("detail", r.text)
         except Exception:
             detail = r.text
         raise RuntimeError(f"Upload failed ({r.status_code}). {detail}")
     data = r.json()
-    return data.get("reply", "") or ""
+    return data.get("replies") or []
 
 if "attach_uploader_key" not in st.session_state:
     st.session_state.attach_uploader_key = 0
 
-with st.sidebar:
+# Runs as a fragment so picking files and submitting the form rerun only this
+# panel, not the whole chat history.
+@st.fragment
+def attach_memories_panel() -> None:
     st.markdown("**📎 Attach Memories**")
     st.caption("Add an image to your memory vault")
     with st.form("attach_image_form", border=True):
@@ -259,35 +303,51 @@ with st.sidebar:
             else:
                 results = st.container()
                 total = len(uploaded)
-                for idx, uf in enumerate(uploaded, start=1):
-                    try:
-                        file_bytes = uf.getvalue()
-                        b64_str = base64.b64encode(file_bytes).decode("utf-8")
-                        with st.spinner(f"Uploading and processing image {idx} of {total}…"):
-                            resp = call_add_memory(b64_str)
+                try:
+                    with st.spinner(f"Uploading and processing {total} image(s)…"):
+                        replies = call_add_memory_batch(uploaded)
+                    for uf, resp in zip(uploaded, replies):
                         results.success(resp or f"{uf.name}: Memory added successfully")
-                    except Exception as e:
-                        results.error(f"{uf.name}: {e}")
+                except Exception as e:
+                    results.error(str(e))
+
+with st.sidebar:
+    attach_memories_panel()
 
 prompt = st.chat_input("Share what's on your mind…")
 
 if prompt:
-    st.session_state.messages.append({"role": "user", "content": prompt})
-    save_messages(st.session_state.messages)
-    with st.chat_message("user"):
+    user_msg = {"role": "user", "content": prompt}
+    st.session_state.messages.append(user_msg)
+    append_message(user_msg)
+    with history_box.chat_message("user"):
         st.markdown(prompt)
 
-    with st.chat_message("assistant"):
+    with history_box.chat_message("assistant"):
         reply_placeholder = st.empty()
         try:
-            api_result = call_chat_api(prompt)
-            reply_text = api_result.get("reply", "")
-            images = api_result.get("images", []) or []
             shown = ""
-            for ch in reply_text:
-                shown += ch
+            buf: List[str] = []
+            last_flush = time.monotonic()
+            images: List[str] = []
+            for event in stream_chat_api(prompt):
+                chunk = event.get("delta", "")
+                if chunk:
+                    buf.append(chunk)
+                elif "reply" in event:
+                    shown = ""
+                    buf = [event["reply"]]
+                if "images" in event:
+                    images = event["images"] or []
+                if buf and (time.monotonic() - last_flush >= STREAM_FLUSH_INTERVAL or "\n" in chunk):
+                    shown += "".join(buf)
+                    buf.clear()
+                    reply_placeholder.markdown(shown)
+                    last_flush = time.monotonic()
+            if buf:
+                shown += "".join(buf)
                 reply_placeholder.markdown(shown)
-                time.sleep(0.002)
+            reply_text = shown
             if images:
                 for img_b64 in images:
                     try:
@@ -304,11 +364,8 @@ if prompt:
             reply_text = gentle_msg
             reply_placeholder.markdown(reply_text)
 
-    st.session_state.messages.append({"role": "assistant", "content": reply_text})
-    save_messages(st.session_state.messages)
+    assistant_msg = {"role": "assistant", "content": reply_text}
+    st.session_state.messages.append(assistant_msg)
+    append_message(assistant_msg)
 
-st.markdown(
-    '<div class="footer">This is a supportive tool and not a substitute for professional care. '
-    'If you’re in immediate danger or crisis, please contact local emergency services or a crisis hotline in your region.</div>',
-    unsafe_allow_html=True,
-)
+st.markdown(_FOOTER_HTML, unsafe_allow_html=True)
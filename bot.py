@@ -1,27 +1,33 @@
 import os
+import asyncio
 import base64
+import json
+from collections import deque
 from contextlib import asynccontextmanager
 from typing import Optional
 from typing import Optional
 import requests
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, File, HTTPException, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, HttpUrl
-from dotenv import load_dotenv
-from google import genai
 import sys
 from pathlib import Path
-import importlib.util
 from dataclasses import dataclass
 
-if importlib.util.find_spec("baml_client") is None:
-    sys.path.insert(0, str(Path(__file__).resolve().parent))
+HERE = Path(__file__).resolve().parent
+if str(HERE) not in sys.path:
+    sys.path.insert(0, str(HERE))
+
+MEMORY_STORE_PATH = os.getenv("MEMORY_STORE_PATH", str(HERE / "memory_store.jsonl"))
+MEMORY_IMAGE_DIR = os.getenv("MEMORY_IMAGE_DIR", str(HERE / "memory_images"))
 
 from baml_client import b as baml  # type: ignore
 import baml_py
+from clients import genai_client
+from memory_store import MemoryStore
 
-from fastapi.responses import HTMLResponse, Response
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 
 
 class ChatRequest(BaseModel):
@@ -36,6 +42,9 @@ class ChatResponse(BaseModel):
 class AddMemoryRequest(BaseModel):
     base_64_image: Optional[str] = None
 
+class AddMemoryBatchResponse(BaseModel):
+    replies: list[str]
+
 @dataclass
 class SelectedMemory:
     description: str
@@ -43,11 +52,11 @@ class SelectedMemory:
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    load_dotenv()
     try:
-        app.state.genai_client = genai.Client()  
+        app.state.genai_client = genai_client()
     except Exception as e:
         raise RuntimeError(f"Failed to initialize GenAI client: {e}")
+    app.state.memory_store = MemoryStore(MEMORY_STORE_PATH, MEMORY_IMAGE_DIR)
     yield
 
 
@@ -88,20 +97,43 @@ def favicon():
 def health():
     return {"status": "ok"}
 
-msg_history : list[str] = []
+MAX_HISTORY_TURNS = 20
+msg_history : deque[str] = deque(maxlen=MAX_HISTORY_TURNS)
+
+def _sse(payload: dict) -> str:
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
 
-@app.post("/chat", response_model=ChatResponse)
+@app.post("/chat")
 async def chat(req: ChatRequest):
     if not req.message or not req.message.strip():
         raise HTTPException(status_code=400, detail="`message` must not be empty.")
 
-    sentiment = await baml.SentimentAnalysis(req.message)
-    selected_memory = await get_memory(req.message)
+    # Sentiment and memory selection are independent; only ChatReply needs both.
+    sentiment, selected_memory = await asyncio.gather(
+        baml.SentimentAnalysis(req.message),
+        get_memory(req.message),
+    )
     memory_description = selected_memory.description
     image_list = selected_memory.images
-    reply_text = await baml.ChatReply(req.message, msg_history, sentiment, memory_description)
-    msg_history.append(req.message + " -> " + reply_text)
-    return ChatResponse(reply=reply_text, images=image_list)
+
+    async def event_stream():
+        stream = baml.stream.ChatReply(req.message, list(msg_history), sentiment, memory_description)
+        shown = ""
+        async for partial in stream:
+            if not partial or partial == shown:
+                continue
+            if partial.startswith(shown):
+                yield _sse({"delta": partial[len(shown):]})
+            else:
+                yield _sse({"reply": partial})
+            shown = partial
+        reply_text = await stream.get_final_response()
+        if reply_text != shown:
+            yield _sse({"reply": reply_text})
+        msg_history.append(req.message + " -> " + reply_text)
+        yield _sse({"images": image_list, "done": True})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
 
 
 if __name__ == "__main__":
@@ -114,14 +146,14 @@ def convert_image_to_base64(image_url: HttpUrl) -> str:
     response.raise_for_status()
     return base64.b64encode(response.content).decode("utf-8")
 
-memory_descriptions : list[dict[str, int | str]] = []
-images_store : list[str] = []
-
 async def get_image_description_from_base64(image_b64: str, media_type: str) -> str:
     image = baml_py.Image.from_base64(media_type, image_b64)
     description = await baml.ImageDescription(image)
     return description
 
+async def get_image_description(raw: bytes, media_type: str) -> str:
+    return await get_image_description_from_base64(base64.b64encode(raw).decode("utf-8"), media_type)
+
 @app.post("/add_memory", response_model=ChatResponse)
 async def add_memory(req: AddMemoryRequest):
     if not req.base_64_image:
@@ -133,30 +165,57 @@ async def add_memory(req: AddMemoryRequest):
             media_type = req.base_64_image[5:].split(";base64,", 1)[0]
 
         b64_data = req.base_64_image.split(",", 1)[-1]
-        base64.b64decode(b64_data, validate=True)
+        raw = base64.b64decode(b64_data, validate=True)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid base64 image data.")
 
     description = await get_image_description_from_base64(b64_data, media_type)
-    images_store.append(req.base_64_image)
-    memory_descriptions.append({
-        "description": description,
-        "image_index": len(images_store) - 1,
-    })
+    remember_image(description, raw, media_type)
+    return ChatResponse(reply=description)
 
+@app.post("/add_memory_file", response_model=ChatResponse)
+async def add_memory_file(image: UploadFile = File(...)):
+    raw, media_type = await read_image_upload(image)
+    description = await get_image_description(raw, media_type)
+    remember_image(description, raw, media_type)
     return ChatResponse(reply=description)
 
+@app.post("/add_memory_batch", response_model=AddMemoryBatchResponse)
+async def add_memory_batch(images: list[UploadFile] = File(...)):
+    uploads = [await read_image_upload(image) for image in images]
+    descriptions = await asyncio.gather(*[
+        get_image_description(raw, media_type)
+        for raw, media_type in uploads
+    ])
+    for description, (raw, media_type) in zip(descriptions, uploads):
+        remember_image(description, raw, media_type)
+    return AddMemoryBatchResponse(replies=list(descriptions))
+
+async def read_image_upload(image: UploadFile) -> tuple[bytes, str]:
+    media_type = image.content_type or "image/png"
+    if not media_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail=f"`{image.filename}` must be an image file.")
+
+    raw = await image.read()
+    if not raw:
+        raise HTTPException(status_code=400, detail=f"`{image.filename}` must not be empty.")
+    return raw, media_type
+
+def remember_image(description: str, raw: bytes, media_type: str) -> None:
+    app.state.memory_store.add(description, raw, media_type)
+
 async def get_memory(query: str) -> SelectedMemory:
-    if not memory_descriptions:
+    store: MemoryStore = app.state.memory_store
+    if not store:
         return SelectedMemory("", [])
 
-    select_memory_response = await baml.SelectMemory(query, memory_descriptions)
+    select_memory_response = await baml.SelectMemory(query, store.descriptions)
     index_list = getattr(select_memory_response, "image_index_list", []) or []
     description = getattr(select_memory_response, "selected_memories_summary", "") or ""
 
     image_list = [
-        images_store[idx]
-        for idx in index_list
-        if isinstance(idx, int) and 0 <= idx < len(images_store)
+        image
+        for image in (store.image(idx) for idx in index_list if isinstance(idx, int))
+        if image is not None
     ]
-    return SelectedMemory(description, image_list)
\ No newline at end of file
+    return SelectedMemory(description, image_list)
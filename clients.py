@@ -0,0 +1,11 @@
+import functools
+
+from dotenv import load_dotenv
+from google import genai
+
+
+@functools.cache
+def genai_client() -> genai.Client:
+    """Process-wide Gemini client; loads `.env` once on first use."""
+    load_dotenv()
+    return genai.Client()
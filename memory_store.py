@@ -0,0 +1,98 @@
+import base64
+import hashlib
+import mimetypes
+import os
+from collections import OrderedDict
+from typing import Optional
+
+import orjson
+
+# Total size of base64 strings kept by _read_image_b64; images otherwise stay on disk.
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("MEMORY_IMAGE_CACHE_BYTES", str(16 * 1024 * 1024)))
+
+_image_cache: "OrderedDict[tuple[str, float], str]" = OrderedDict()
+_image_cache_bytes = 0
+
+
+def _read_image_b64(path: str, mtime: float) -> str:
+    # `mtime` is only part of the cache key, so a rewritten file is re-read.
+    global _image_cache_bytes
+    key = (path, mtime)
+    encoded = _image_cache.get(key)
+    if encoded is not None:
+        _image_cache.move_to_end(key)
+        return encoded
+    with open(path, "rb") as f:
+        encoded = base64.b64encode(f.read()).decode("utf-8")
+    if len(encoded) <= IMAGE_CACHE_MAX_BYTES:
+        _image_cache[key] = encoded
+        _image_cache_bytes += len(encoded)
+        while _image_cache_bytes > IMAGE_CACHE_MAX_BYTES:
+            _, evicted = _image_cache.popitem(last=False)
+            _image_cache_bytes -= len(evicted)
+    return encoded
+
+
+class MemoryStore:
+    """Image memories persisted as one JSON line per memory.
+
+    Image bytes are written once to `image_dir` under their content hash and
+    only the path is kept in memory. `descriptions` is kept in the shape
+    `baml.SelectMemory` expects, with `image_index` pointing into
+    `image_paths`.
+    """
+
+    def __init__(self, path: str, image_dir: str):
+        self.path = path
+        self.image_dir = image_dir
+        self.descriptions: list[dict[str, int | str]] = []
+        self.image_paths: list[str] = []
+        os.makedirs(self.image_dir, exist_ok=True)
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.image_paths)
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    continue
+                self._append(record["description"], record["image_path"])
+
+    def _append(self, description: str, image_path: str) -> int:
+        self.image_paths.append(image_path)
+        index = len(self.image_paths) - 1
+        self.descriptions.append({"description": description, "image_index": index})
+        return index
+
+    def _write_image(self, raw: bytes, media_type: str) -> str:
+        ext = mimetypes.guess_extension(media_type) or ".bin"
+        image_path = os.path.join(self.image_dir, hashlib.sha256(raw).hexdigest() + ext)
+        if not os.path.exists(image_path):
+            with open(image_path, "wb") as f:
+                f.write(raw)
+        return image_path
+
+    def add(self, description: str, raw: bytes, media_type: str) -> int:
+        image_path = self._write_image(raw, media_type)
+        index = self._append(description, image_path)
+        with open(self.path, "ab") as f:
+            f.write(orjson.dumps({"description": description, "image_path": image_path}) + b"\n")
+        return index
+
+    def image(self, index: int) -> Optional[str]:
+        """Return the stored image at `index` as base64, or None."""
+        if not 0 <= index < len(self.image_paths):
+            return None
+        path = self.image_paths[index]
+        try:
+            return _read_image_b64(path, os.path.getmtime(path))
+        except OSError:
+            return None
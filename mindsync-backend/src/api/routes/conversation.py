@@ -1,17 +1,21 @@
 """
 Conversation endpoints
 """
-from fastapi import APIRouter, Depends, WebSocket
+from fastapi import APIRouter, Depends, Request, WebSocket
 from src.services.agent.agent_orchestrator import AgentOrchestrator
 from src.models.schemas.conversation import ConversationMessage, ConversationResponse
 
 router = APIRouter()
 
+def get_agent(request: Request) -> AgentOrchestrator:
+    """Shared agent created at startup"""
+    return request.app.state.agent
+
 @router.post("/message", response_model=ConversationResponse)
 async def send_message(
     message: ConversationMessage,
     user_id: str,
-    agent: AgentOrchestrator = Depends()
+    agent: AgentOrchestrator = Depends(get_agent)
 ):
     """Send message to agent"""
     response = await agent.run(
@@ -26,13 +30,24 @@ async def send_message(
 async def websocket_endpoint(websocket: WebSocket, user_id: str):
     """WebSocket endpoint for real-time chat"""
     await websocket.accept()
-    agent = AgentOrchestrator()
+    agent = websocket.app.state.agent
     
     try:
         while True:
             data = await websocket.receive_text()
-            response = await agent.run(user_id, data, [])
-            await websocket.send_text(response)
+            streamed = False
+            
+            async def send_delta(token: str) -> None:
+                nonlocal streamed
+                streamed = True
+                await websocket.send_json({"delta": token})
+            
+            reply = await agent.stream(user_id, data, agent.history(user_id), send_delta)
+            if not streamed:
+                # Nothing came through as tokens; send the final output as one frame
+                await websocket.send_json({"delta": reply})
+            agent.remember_turn(user_id, data, reply)
+            await websocket.send_json({"done": True})
     except Exception as e:
         print(f"WebSocket error: {e}")
     finally:
@@ -17,6 +17,15 @@ async def create_memory(
     """Store a new positive memory"""
     return await memory_service.store_memory(user_id, memory)
 
+@router.post("/batch", response_model=List[Memory])
+async def create_memories(
+    memories: List[MemoryCreate],
+    user_id: str,  # In production, get from auth token
+    memory_service: MemoryService = Depends()
+):
+    """Store several positive memories in one batched pass"""
+    return await memory_service.store_memories(user_id, memories)
+
 @router.get("/recall", response_model=List[Memory])
 async def recall_memories(
     mood_context: str,
@@ -27,6 +36,16 @@ async def recall_memories(
     """Retrieve relevant memories based on mood"""
     return await memory_service.recall_memories(user_id, mood_context, top_k)
 
+@router.post("/recall/batch")
+async def recall_memories_batch(
+    mood_contexts: List[str],
+    user_id: str,
+    top_k: int = 5,
+    memory_service: MemoryService = Depends()
+):
+    """Retrieve memories for several moods with one embedding pass and one query"""
+    return await memory_service.recall_memories_batch(user_id, mood_contexts, top_k)
+
 @router.delete("/{memory_id}")
 async def delete_memory(
     memory_id: str,
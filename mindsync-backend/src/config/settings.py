@@ -19,19 +19,35 @@ class Settings(BaseSettings):
     # Vector Database
     VECTOR_DB_TYPE: str = "chromadb"  # chromadb, pinecone, qdrant
     CHROMA_PERSIST_DIR: str = "./data/chroma"
+    CHROMA_MODE: str = "persistent"  # persistent, http
+    CHROMA_HOST: str = "localhost"
+    CHROMA_PORT: int = 8000
+    CHROMA_MAX_CONCURRENCY: int = 4
     
     # LLM Configuration
     LLM_PROVIDER: str = "openai"  # openai, ollama, anthropic
     LLM_MODEL: str = "gpt-4o-mini"
     OPENAI_API_KEY: str = ""
+    MAX_HISTORY_TURNS: int = 20
+    MAX_HISTORY_USERS: int = 10000
     
     # Embeddings
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
     EMBEDDING_DIMENSION: int = 384
+    EMBEDDING_BATCH_SIZE: int = 32
+    EMBEDDING_CACHE_SIZE: int = 1024
+    EMBEDDING_BATCH_WAIT_MS: int = 5
+    EMBEDDING_CHUNK_SIZE: int = 256
+    EMBEDDING_MAX_IN_FLIGHT: int = 2
     
     # Memory Service
     MAX_MEMORY_RECALL: int = 5
     MEMORY_RELEVANCE_THRESHOLD: float = 0.7
+    INGEST_QUEUE_SIZE: int = 4
+    RECALL_BATCH_WINDOW_MS: int = 10
+    RECALL_MAX_BATCH: int = 32
+    QUERY_CACHE_SIZE: int = 2000
+    QUERY_CACHE_TTL_SECONDS: float = 300.0
     
     # Safety
     ENABLE_SAFETY_MONITOR: bool = True
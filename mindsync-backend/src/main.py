@@ -7,6 +7,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from src.api.routes import health, memory, conversation, user
 from src.config.settings import get_settings
 from src.core.database import init_db
+from src.services.agent.agent_orchestrator import AgentOrchestrator
+from src.services.memory.memory_service import load_mood_embeddings
 
 settings = get_settings()
 
@@ -35,6 +37,8 @@ app.include_router(conversation.router, prefix="/api/v1/conversation", tags=["co
 async def startup_event():
     """Initialize services on startup"""
     await init_db()
+    app.state.agent = AgentOrchestrator()
+    await load_mood_embeddings()
     print("MindSync API started successfully")
 
 
@@ -1,21 +1,51 @@
 """
 Agent Orchestrator - Manages LLM and tool execution
 """
-from typing import List, Dict, Any
+import asyncio
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, List, Dict, Any
 from langchain.agents import AgentExecutor, create_openai_functions_agent
+from langchain.callbacks.base import AsyncCallbackHandler
 from langchain.chat_models import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain.schema import AIMessage, BaseMessage, HumanMessage
 from langchain.tools import Tool
 from src.services.agent.tools import MemoryRecallTool, MoodAnalysisTool
 from src.config.settings import get_settings
 
 settings = get_settings()
 
+SYSTEM_PROMPT = """You are MindSync, an empathetic AI mental health companion.
+
+Your capabilities:
+- You have access to the user's positive memories through the memory_recall tool
+- You can detect emotional tone and offer support
+- When the user seems down, you can retrieve and gently reference their happy memories
+
+Guidelines:
+- Be warm, validating, and non-judgmental
+- If mood is low, consider using the memory_recall tool
+- Integrate memories naturally into conversation
+- Never force positivity; acknowledge their current feelings first
+- Always respect user privacy and consent"""
+
+class _TokenQueueHandler(AsyncCallbackHandler):
+    """Collects streamed LLM tokens on an asyncio queue"""
+    
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue()
+    
+    async def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        # Function-call chunks carry no content and are skipped
+        if token:
+            self.queue.put_nowait(token)
+
 class AgentOrchestrator:
     def __init__(self):
         self.llm = ChatOpenAI(
             model=settings.LLM_MODEL,
             temperature=0.7,
+            streaming=True,
             api_key=settings.OPENAI_API_KEY
         )
         
@@ -36,34 +66,77 @@ class AgentOrchestrator:
             tools=self.tools,
             verbose=True
         )
+        
+        # Server-side history for clients that don't resend it (websocket),
+        # least recently active users evicted beyond MAX_HISTORY_USERS
+        self.histories: "OrderedDict[str, Deque[BaseMessage]]" = OrderedDict()
     
     def _create_prompt(self) -> ChatPromptTemplate:
         """Create system prompt for the agent"""
         return ChatPromptTemplate.from_messages([
-            ("system", """You are MindSync, an empathetic AI mental health companion.
-
-Your capabilities:
-- You have access to the user's positive memories through the memory_recall tool
-- You can detect emotional tone and offer support
-- When the user seems down, you can retrieve and gently reference their happy memories
-
-Guidelines:
-- Be warm, validating, and non-judgmental
-- If mood is low, consider using the memory_recall tool
-- Integrate memories naturally into conversation
-- Never force positivity; acknowledge their current feelings first
-- Always respect user privacy and consent"""),
+            ("system", SYSTEM_PROMPT),
             MessagesPlaceholder(variable_name="chat_history"),
             ("human", "{input}"),
             MessagesPlaceholder(variable_name="agent_scratchpad")
         ])
     
+    def history(self, user_id: str) -> List[BaseMessage]:
+        """Recent turns kept for a user"""
+        return list(self.histories.get(user_id, ()))
+    
+    def remember_turn(self, user_id: str, message: str, reply: str) -> None:
+        """Append a user/assistant turn to the server-side history"""
+        turns = self.histories.get(user_id)
+        if turns is None:
+            turns = self.histories[user_id] = deque(maxlen=2 * settings.MAX_HISTORY_TURNS)
+        else:
+            self.histories.move_to_end(user_id)
+        turns.extend([HumanMessage(content=message), AIMessage(content=reply)])
+        while len(self.histories) > settings.MAX_HISTORY_USERS:
+            self.histories.popitem(last=False)
+    
     async def run(self, user_id: str, message: str, chat_history: List[Dict]) -> str:
         """Execute agent with user message"""
         result = await self.executor.ainvoke({
             "input": message,
-            "chat_history": chat_history,
+            "chat_history": chat_history[-2 * settings.MAX_HISTORY_TURNS:],
             "user_id": user_id
         })
         
         return result["output"]
+    
+    async def stream(
+        self,
+        user_id: str,
+        message: str,
+        chat_history: List[Dict],
+        on_token: Callable[[str], Awaitable[None]]
+    ) -> str:
+        """Execute agent, passing reply tokens to on_token as they are generated; returns the final output"""
+        handler = _TokenQueueHandler()
+        task = asyncio.create_task(self.executor.ainvoke(
+            {
+                "input": message,
+                "chat_history": chat_history[-2 * settings.MAX_HISTORY_TURNS:],
+                "user_id": user_id
+            },
+            config={"callbacks": [handler]}
+        ))
+        
+        try:
+            while not (task.done() and handler.queue.empty()):
+                next_token = asyncio.ensure_future(handler.queue.get())
+                done, _ = await asyncio.wait(
+                    {next_token, task},
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if next_token in done:
+                    await on_token(next_token.result())
+                else:
+                    next_token.cancel()
+            # Surface any agent error; some output (e.g. iteration-limit stops) is never streamed
+            result = await task
+            return result["output"]
+        finally:
+            if not task.done():
+                task.cancel()
@@ -4,6 +4,11 @@ Agent Tools - Memory recall and mood analysis tools
 from langchain.tools import BaseTool
 from typing import Optional, Type
 from pydantic import BaseModel, Field
+# The lexicon scorer behind TextBlob(...).sentiment, without the per-call blob
+from textblob.en import sentiment as pattern_sentiment
+
+# Parse en-sentiment.xml at import (app startup) instead of on the first user message
+pattern_sentiment.load()
 
 class MemoryRecallInput(BaseModel):
     """Input for memory recall tool"""
@@ -30,13 +35,16 @@ class MemoryRecallTool(BaseTool):
             top_k=3
         )
         
-        if not memories:
+        # Chroma returns one column per field, each nested per query embedding
+        documents = (memories.get('documents') or [[]])[0]
+        metadatas = (memories.get('metadatas') or [[]])[0]
+        if not documents:
             return "No positive memories found in storage yet."
         
-        memory_text = "\n".join([
-            f"- {m.get('documents', [''])[0]} (mood: {m.get('metadatas', [{}])[0].get('mood_score', 'N/A')})"
-            for m in memories.get('ids', [])
-        ])
+        memory_text = "\n".join(
+            f"- {document} (mood: {(metadata or {}).get('mood_score', 'N/A')})"
+            for document, metadata in zip(documents, metadatas)
+        )
         
         return f"Retrieved positive memories:\n{memory_text}"
 
@@ -56,10 +64,7 @@ class MoodAnalysisTool(BaseTool):
     async def _arun(self, message: str) -> float:
         """Analyze mood from message"""
         # Simple sentiment analysis - replace with more sophisticated model
-        from textblob import TextBlob
-        
-        blob = TextBlob(message)
-        sentiment = blob.sentiment.polarity  # -1 to 1
+        sentiment = pattern_sentiment(message)[0]  # polarity, -1 to 1
         
         # Convert to 0-10 scale
         mood_score = (sentiment + 1) * 5
@@ -1,8 +1,17 @@
 from pathlib import Path
 from typing import Union, BinaryIO
+from contextlib import contextmanager
+import asyncio
+import hashlib
+import os
 import shutil
+import tempfile
 
 DIR_PATH = "./data/database/object_storage"
+# Read size for stream copies; shutil's 64 KiB default means many more syscalls on media files
+COPY_BUFFER_SIZE = 1024 * 1024
+# Content-addressed store under dir_path; uploaded filenames are hard links into it
+BLOB_DIR_NAME = "blobs"
 
 class ObjectStorageService:
     def __init__(self):
@@ -32,12 +41,97 @@ class ObjectStorageService:
     def upload_photo(self, photo_data: Union[bytes, BinaryIO, str, Path], filename: str) -> Path:
         return self._save_file(photo_data, self.photo_dir / filename)
     
+    # Async variants run the blocking write on a worker thread so event-loop callers aren't stalled
+    
+    async def upload_video_async(self, video_data: Union[bytes, BinaryIO, str, Path], filename: str) -> Path:
+        return await asyncio.to_thread(self.upload_video, video_data, filename)
+    
+    async def upload_audio_async(self, audio_data: Union[bytes, BinaryIO, str, Path], filename: str) -> Path:
+        return await asyncio.to_thread(self.upload_audio, audio_data, filename)
+    
+    async def upload_text_async(self, text_data: Union[str, bytes], filename: str) -> Path:
+        return await asyncio.to_thread(self.upload_text, text_data, filename)
+    
+    async def upload_photo_async(self, photo_data: Union[bytes, BinaryIO, str, Path], filename: str) -> Path:
+        return await asyncio.to_thread(self.upload_photo, photo_data, filename)
+    
     def _save_file(self, data: Union[bytes, BinaryIO, str, Path], target_path: Path) -> Path:
+        blob_path = self._store_blob(data)
+        # Replace rather than write through, so other names sharing the blob keep their content
+        if target_path.is_symlink() or target_path.exists():
+            self._release_name(target_path, keep=blob_path)
+        try:
+            os.link(blob_path, target_path)
+        except FileNotFoundError:
+            # Missing parent directory; surface it as a plain write would
+            raise
+        except OSError:
+            # Filesystem without hard links
+            shutil.copy2(blob_path, target_path)
+        return target_path
+    
+    def _release_name(self, target_path: Path, keep: Path) -> None:
+        """Unlink a stored name, deleting its blob too if that was the blob's last other name."""
+        if not target_path.is_symlink() and target_path.stat().st_nlink == 2:
+            old_blob = self.dir_path / BLOB_DIR_NAME / self._file_digest(target_path)
+            if old_blob != keep and old_blob.exists() and os.path.samefile(old_blob, target_path):
+                old_blob.unlink()
+        target_path.unlink()
+    
+    @staticmethod
+    def _file_digest(path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            while chunk := f.read(COPY_BUFFER_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def _has_blob(blob_path: Path, size: int) -> bool:
+        """An existing blob is reused only if it is complete."""
+        return blob_path.exists() and blob_path.stat().st_size == size
+    
+    def _store_blob(self, data: Union[bytes, BinaryIO, str, Path]) -> Path:
+        """Store content once under its SHA-256 digest and return the blob path."""
+        blob_dir = self.dir_path / BLOB_DIR_NAME
+        blob_dir.mkdir(parents=True, exist_ok=True)
         if isinstance(data, bytes):
-            target_path.write_bytes(data)
-        elif isinstance(data, (str, Path)):
-            shutil.copy2(data, target_path)
+            blob_path = blob_dir / hashlib.sha256(data).hexdigest()
+            if self._has_blob(blob_path, len(data)):
+                return blob_path
+            with self._spool(blob_dir) as (f, tmp_path):
+                f.write(data)
+            os.replace(tmp_path, blob_path)
+            return blob_path
+        if isinstance(data, (str, Path)):
+            with open(data, 'rb') as source:
+                return self._store_stream(source, blob_dir)
+        return self._store_stream(data, blob_dir)
+    
+    def _store_stream(self, stream: BinaryIO, blob_dir: Path) -> Path:
+        """Hash and spool a stream in one pass, keeping the copy only if the digest is new."""
+        digest = hashlib.sha256()
+        size = 0
+        with self._spool(blob_dir) as (f, tmp_path):
+            while chunk := stream.read(COPY_BUFFER_SIZE):
+                digest.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        blob_path = blob_dir / digest.hexdigest()
+        if self._has_blob(blob_path, size):
+            tmp_path.unlink()
         else:
-            with open(target_path, 'wb') as f:
-                shutil.copyfileobj(data, f)
-        return target_path
\ No newline at end of file
+            os.replace(tmp_path, blob_path)
+        return blob_path
+    
+    @contextmanager
+    def _spool(self, blob_dir: Path):
+        """Temp file in blob_dir, removed again if writing fails."""
+        fd, tmp_name = tempfile.mkstemp(dir=blob_dir, prefix=".tmp-")
+        tmp_path = Path(tmp_name)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                yield f, tmp_path
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
@@ -1,42 +1,152 @@
-import psycopg2
-from psycopg2 import sql, extras
-from typing import Optional, List, Dict, Any
-from datetime import datetime, date
+from psycopg2 import sql, extras, extensions, pool
+from typing import Optional, List, Dict, Any, Tuple, Union
+from datetime import datetime, date, timedelta
 from contextlib import contextmanager
 
 
+# Explicit select lists: a prepared plan fixes its result columns, so a later
+# ALTER TABLE would otherwise break every pooled connection that prepared SELECT *
+USER_COLUMNS = "user_id, user_name, user_email, created_at"
+CHAT_HISTORY_COLUMNS = "user_id, time_stamp, chat_content"
+MOOD_COLUMNS = "user_id, date, average_mood"
+
+# Hot statements, PREPAREd once per pooled connection: name -> (parameter types, SQL)
+PREPARED_STATEMENTS = {
+    "get_user_by_id": (
+        "integer",
+        f"SELECT {USER_COLUMNS} FROM users WHERE user_id = $1"
+    ),
+    "get_user_by_email": (
+        "varchar",
+        f"SELECT {USER_COLUMNS} FROM users WHERE user_email = $1"
+    ),
+    "add_chat_history": (
+        "integer, timestamp, text",
+        f"INSERT INTO chat_history ({CHAT_HISTORY_COLUMNS}) VALUES ($1, $2, $3)"
+    ),
+    "get_chat_history_by_user": (
+        "integer",
+        f"SELECT {CHAT_HISTORY_COLUMNS} FROM chat_history WHERE user_id = $1 ORDER BY time_stamp DESC"
+    ),
+    "get_mood_by_date": (
+        "integer, date",
+        f"SELECT {MOOD_COLUMNS} FROM mood WHERE user_id = $1 AND date = $2"
+    ),
+}
+
+def _build_range_queries(table: str, column: str) -> Dict[Tuple[bool, bool], str]:
+    """Per-user SELECT for each (has_start, has_end) combination of optional bounds on column."""
+    queries = {}
+    for has_start in (False, True):
+        for has_end in (False, True):
+            query = f"SELECT * FROM {table} WHERE user_id = %s"
+            if has_start:
+                query += f" AND {column} >= %s"
+            if has_end:
+                query += f" AND {column} <= %s"
+            queries[(has_start, has_end)] = query + f" ORDER BY {column} DESC"
+    return queries
+
+
+# Fixed statement text per filter combination, built once at import
+CHAT_HISTORY_QUERIES = _build_range_queries("chat_history", "time_stamp")
+MOOD_HISTORY_QUERIES = _build_range_queries("mood", "date")
+CHAT_HISTORY_JSON_QUERIES = {
+    key: "SELECT COALESCE(json_agg(t ORDER BY t.time_stamp DESC), '[]'::json)::text AS history "
+         f"FROM ({query}) t"
+    for key, query in CHAT_HISTORY_QUERIES.items()
+}
+
+
+def _full_month_bounds(start_date: date, end_date: date) -> Tuple[date, date]:
+    """[full_start, full_end) covering the whole calendar months inside [start_date, end_date]."""
+    if start_date.day == 1:
+        full_start = start_date
+    else:
+        full_start = (start_date.replace(day=28) + timedelta(days=4)).replace(day=1)
+    day_after = end_date + timedelta(days=1)
+    full_end = day_after if day_after.day == 1 else end_date.replace(day=1)
+    return full_start, full_end
+
+
+# Whole months inside the range come from mood_rollup_monthly; only the
+# partial months at either edge are read from the daily mood rows
+AVERAGE_MOOD_RANGE = """
+WITH months AS (
+    SELECT COALESCE(SUM(mood_sum), 0) AS total, COALESCE(SUM(mood_count), 0) AS days
+    FROM mood_rollup_monthly
+    WHERE user_id = %(user_id)s AND month >= %(full_start)s AND month < %(full_end)s
+),
+edges AS (
+    SELECT COALESCE(SUM(average_mood), 0) AS total, COUNT(*) AS days
+    FROM mood
+    WHERE user_id = %(user_id)s AND date BETWEEN %(start_date)s AND %(end_date)s
+      AND NOT (date >= %(full_start)s AND date < %(full_end)s)
+)
+SELECT (months.total + edges.total) / NULLIF(months.days + edges.days, 0) AS avg_mood
+FROM months, edges;
+"""
+
+
+UPSERT_MOOD = """
+INSERT INTO mood (user_id, date, average_mood)
+VALUES (%s, %s, %s)
+ON CONFLICT (user_id, date) 
+DO UPDATE SET average_mood = EXCLUDED.average_mood;
+"""
+
+
+class PreparingConnection(extensions.connection):
+    """Connection that remembers which statements it has PREPAREd in its session."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
 class RelationalDatabaseService:
     """Service for managing relational database operations for users, chat history, and mood tracking."""
     
-    def __init__(self, db_config: Dict[str, Any]):
+    def __init__(self, db_config: Dict[str, Any], min_connections: int = 1,
+                 max_connections: int = 10):
         """
-        Initialize database connection.
+        Initialize database connection pool.
         
         Args:
             db_config: Dictionary containing database configuration
                       (host, database, user, password, port)
+            min_connections: Connections opened up front
+            max_connections: Upper bound on concurrently checked-out connections
         """
         self.db_config = db_config
-        self.connection = None
-        self.cursor = None
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self.pool = None
         self._connect()
     
     def _connect(self):
-        """Establish database connection."""
-        self.connection = psycopg2.connect(**self.db_config)
-        self.cursor = self.connection.cursor(cursor_factory=extras.RealDictCursor)
+        """Create the thread-safe connection pool."""
+        self.pool = pool.ThreadedConnectionPool(
+            self.min_connections, self.max_connections,
+            connection_factory=PreparingConnection, **self.db_config
+        )
     
     @contextmanager
     def get_cursor(self):
-        """Context manager for cursor operations with automatic commit/rollback."""
+        """Context manager that checks out a pooled connection, with automatic commit/rollback."""
+        connection = self.pool.getconn()
         try:
-            yield self.cursor
-            self.connection.commit()
+            with connection.cursor(cursor_factory=extras.RealDictCursor) as cursor:
+                yield cursor
+            connection.commit()
         except Exception as e:
-            self.connection.rollback()
+            connection.rollback()
             raise e
+        finally:
+            # Discard connections that broke, e.g. after a server restart, rather than reuse them
+            self.pool.putconn(connection, close=connection.closed != 0)
     
-    def execute_query(self, query: str, params: Optional[tuple] = None) -> List[Dict]:
+    def execute_query(self, query: str, params: Optional[Union[tuple, Dict[str, Any]]] = None) -> List[Dict]:
         """
         Execute a query and return results.
         
@@ -53,6 +163,29 @@ class RelationalDatabaseService:
                 return cursor.fetchall()
             return []
     
+    def execute_prepared(self, name: str, params: tuple) -> List[Dict]:
+        """
+        Execute one of PREPARED_STATEMENTS, preparing it on first use per connection.
+        
+        Args:
+            name: Key into PREPARED_STATEMENTS
+            params: Statement parameters
+            
+        Returns:
+            List of dictionaries containing query results
+        """
+        with self.get_cursor() as cursor:
+            connection = cursor.connection
+            if name not in connection.prepared:
+                types, statement = PREPARED_STATEMENTS[name]
+                cursor.execute(f"PREPARE {name} ({types}) AS {statement};")
+                connection.prepared.add(name)
+            placeholders = ", ".join(["%s"] * len(params))
+            cursor.execute(f"EXECUTE {name} ({placeholders});", params)
+            if cursor.description:  # SELECT query
+                return cursor.fetchall()
+            return []
+    
     def initialize_tables(self):
         """Create all necessary tables if they don't exist."""
         # Create User table
@@ -87,10 +220,62 @@ class RelationalDatabaseService:
         );
         """
         
-        # Create indexes for better query performance
+        # Chat history is served by its (user_id, time_stamp) primary key, scanned
+        # backwards; chat_content is unbounded, so it stays out of any btree entry.
+        # Mood gets a covering index so lookups can be index-only scans
         create_indexes = """
-        CREATE INDEX IF NOT EXISTS idx_chat_history_timestamp ON chat_history(time_stamp);
-        CREATE INDEX IF NOT EXISTS idx_mood_date ON mood(date);
+        DROP INDEX IF EXISTS idx_chat_history_timestamp;
+        DROP INDEX IF EXISTS idx_chat_user_ts;
+        DROP INDEX IF EXISTS idx_mood_date;
+        CREATE INDEX IF NOT EXISTS idx_mood_user_date
+            ON mood (user_id, date DESC) INCLUDE (average_mood);
+        """
+        
+        # Per-user monthly mood sums, kept current by a trigger on mood so
+        # range averages can read whole months without scanning daily rows
+        create_mood_rollup_table = """
+        CREATE TABLE IF NOT EXISTS mood_rollup_monthly (
+            user_id INTEGER NOT NULL,
+            month DATE NOT NULL,
+            mood_sum DOUBLE PRECISION NOT NULL,
+            mood_count INTEGER NOT NULL,
+            PRIMARY KEY (user_id, month),
+            FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+        );
+        """
+        
+        backfill_mood_rollup = """
+        INSERT INTO mood_rollup_monthly (user_id, month, mood_sum, mood_count)
+        SELECT user_id, date_trunc('month', date)::date, SUM(average_mood), COUNT(*)
+        FROM mood
+        GROUP BY 1, 2;
+        """
+        
+        create_mood_rollup_trigger = """
+        CREATE OR REPLACE FUNCTION mood_rollup_apply() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE mood_rollup_monthly
+                SET mood_sum = mood_sum - OLD.average_mood,
+                    mood_count = mood_count - 1
+                WHERE user_id = OLD.user_id
+                  AND month = date_trunc('month', OLD.date)::date;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO mood_rollup_monthly (user_id, month, mood_sum, mood_count)
+                VALUES (NEW.user_id, date_trunc('month', NEW.date)::date, NEW.average_mood, 1)
+                ON CONFLICT (user_id, month)
+                DO UPDATE SET mood_sum = mood_rollup_monthly.mood_sum + EXCLUDED.mood_sum,
+                              mood_count = mood_rollup_monthly.mood_count + 1;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        
+        DROP TRIGGER IF EXISTS mood_rollup_trigger ON mood;
+        CREATE TRIGGER mood_rollup_trigger
+            AFTER INSERT OR UPDATE OR DELETE ON mood
+            FOR EACH ROW EXECUTE FUNCTION mood_rollup_apply();
         """
         
         with self.get_cursor() as cursor:
@@ -98,6 +283,13 @@ class RelationalDatabaseService:
             cursor.execute(create_chat_history_table)
             cursor.execute(create_mood_table)
             cursor.execute(create_indexes)
+            
+            cursor.execute("SELECT to_regclass('mood_rollup_monthly') IS NULL AS missing;")
+            rollup_missing = cursor.fetchone()['missing']
+            cursor.execute(create_mood_rollup_table)
+            if rollup_missing:
+                cursor.execute(backfill_mood_rollup)
+            cursor.execute(create_mood_rollup_trigger)
     
     # ===== User Operations =====
     
@@ -132,8 +324,7 @@ class RelationalDatabaseService:
         Returns:
             Dictionary containing user information or None if not found
         """
-        query = "SELECT * FROM users WHERE user_id = %s;"
-        results = self.execute_query(query, (user_id,))
+        results = self.execute_prepared("get_user_by_id", (user_id,))
         return results[0] if results else None
     
     def get_user_by_email(self, user_email: str) -> Optional[Dict]:
@@ -146,8 +337,7 @@ class RelationalDatabaseService:
         Returns:
             Dictionary containing user information or None if not found
         """
-        query = "SELECT * FROM users WHERE user_email = %s;"
-        results = self.execute_query(query, (user_email,))
+        results = self.execute_prepared("get_user_by_email", (user_email,))
         return results[0] if results else None
     
     def update_user(self, user_id: int, user_name: Optional[str] = None, 
@@ -225,11 +415,63 @@ class RelationalDatabaseService:
         if time_stamp is None:
             time_stamp = datetime.now()
         
+        self.execute_prepared("add_chat_history", (user_id, time_stamp, chat_content))
+        return True
+    
+    def add_chat_history_bulk(self, rows: List[tuple], page_size: int = 500) -> int:
+        """
+        Add many chat history entries in a single transaction.
+        
+        Args:
+            rows: (user_id, time_stamp, chat_content) tuples
+            page_size: Rows sent per INSERT statement
+            
+        Returns:
+            Number of rows inserted
+        """
+        if not rows:
+            return 0
+        
         query = """
         INSERT INTO chat_history (user_id, time_stamp, chat_content)
-        VALUES (%s, %s, %s);
+        VALUES %s;
+        """
+        with self.get_cursor() as cursor:
+            extras.execute_values(cursor, query, rows, page_size=page_size)
+        return len(rows)
+    
+    def record_turn(self, user_id: int, user_message: str, assistant_message: str,
+                    average_mood: Optional[float] = None,
+                    time_stamp: Optional[datetime] = None) -> bool:
+        """
+        Persist a conversation turn, and optionally today's mood, in one round trip.
+        
+        Args:
+            user_id: ID of the user
+            user_message: What the user said
+            assistant_message: The agent's reply
+            average_mood: Mood value (0-10) to upsert for the turn's date (optional)
+            time_stamp: Timestamp of the user message (defaults to current time)
+            
+        Returns:
+            True if insertion successful
         """
-        self.execute_query(query, (user_id, time_stamp, chat_content))
+        if time_stamp is None:
+            time_stamp = datetime.now()
+        # (user_id, time_stamp) is the key, so the reply sorts just after the message
+        reply_time_stamp = time_stamp + timedelta(microseconds=1)
+        
+        with self.get_cursor() as cursor:
+            statements = [cursor.mogrify(
+                """
+                INSERT INTO chat_history (user_id, time_stamp, chat_content)
+                VALUES (%s, %s, %s), (%s, %s, %s);
+                """,
+                (user_id, time_stamp, user_message, user_id, reply_time_stamp, assistant_message)
+            )]
+            if average_mood is not None:
+                statements.append(cursor.mogrify(UPSERT_MOOD, (user_id, time_stamp.date(), average_mood)))
+            cursor.execute(b"".join(statements))
         return True
     
     def get_chat_history_by_user(self, user_id: int, 
@@ -246,20 +488,35 @@ class RelationalDatabaseService:
         Returns:
             List of chat history entries
         """
-        query = "SELECT * FROM chat_history WHERE user_id = %s"
-        params = [user_id]
+        if not start_date and not end_date:
+            return self.execute_prepared("get_chat_history_by_user", (user_id,))
         
-        if start_date:
-            query += " AND time_stamp >= %s"
-            params.append(start_date)
+        query = CHAT_HISTORY_QUERIES[(start_date is not None, end_date is not None)]
+        params = (user_id,) + tuple(d for d in (start_date, end_date) if d is not None)
+        return self.execute_query(query, params)
+    
+    def get_chat_history_json(self, user_id: int,
+                              start_date: Optional[datetime] = None,
+                              end_date: Optional[datetime] = None) -> str:
+        """
+        Get chat history for a user as a JSON array built by Postgres.
         
-        if end_date:
-            query += " AND time_stamp <= %s"
-            params.append(end_date)
+        Rows are aggregated server-side and returned as one string, so no
+        per-row Python dicts are built for responses that only serialize them.
         
-        query += " ORDER BY time_stamp DESC;"
+        Args:
+            user_id: ID of the user
+            start_date: Start date for filtering (optional)
+            end_date: End date for filtering (optional)
+            
+        Returns:
+            JSON array text of chat history entries, newest first
+        """
+        query = CHAT_HISTORY_JSON_QUERIES[(start_date is not None, end_date is not None)]
+        params = (user_id,) + tuple(d for d in (start_date, end_date) if d is not None)
         
-        return self.execute_query(query, tuple(params))
+        results = self.execute_query(query, params)
+        return results[0]['history']
     
     def get_chat_history_by_timestamp(self, user_id: int, 
                                       time_stamp: datetime) -> Optional[Dict]:
@@ -337,13 +594,7 @@ class RelationalDatabaseService:
         if mood_date is None:
             mood_date = date.today()
         
-        query = """
-        INSERT INTO mood (user_id, date, average_mood)
-        VALUES (%s, %s, %s)
-        ON CONFLICT (user_id, date) 
-        DO UPDATE SET average_mood = EXCLUDED.average_mood;
-        """
-        self.execute_query(query, (user_id, mood_date, average_mood))
+        self.execute_query(UPSERT_MOOD, (user_id, mood_date, average_mood))
         return True
     
     def get_mood_by_date(self, user_id: int, mood_date: date) -> Optional[Dict]:
@@ -357,11 +608,7 @@ class RelationalDatabaseService:
         Returns:
             Mood entry or None if not found
         """
-        query = """
-        SELECT * FROM mood 
-        WHERE user_id = %s AND date = %s;
-        """
-        results = self.execute_query(query, (user_id, mood_date))
+        results = self.execute_prepared("get_mood_by_date", (user_id, mood_date))
         return results[0] if results else None
     
     def get_mood_history(self, user_id: int, 
@@ -378,20 +625,9 @@ class RelationalDatabaseService:
         Returns:
             List of mood entries
         """
-        query = "SELECT * FROM mood WHERE user_id = %s"
-        params = [user_id]
-        
-        if start_date:
-            query += " AND date >= %s"
-            params.append(start_date)
-        
-        if end_date:
-            query += " AND date <= %s"
-            params.append(end_date)
-        
-        query += " ORDER BY date DESC;"
-        
-        return self.execute_query(query, tuple(params))
+        query = MOOD_HISTORY_QUERIES[(start_date is not None, end_date is not None)]
+        params = (user_id,) + tuple(d for d in (start_date, end_date) if d is not None)
+        return self.execute_query(query, params)
     
     def update_mood(self, user_id: int, mood_date: date, 
                    average_mood: float) -> bool:
@@ -442,22 +678,23 @@ class RelationalDatabaseService:
         Returns:
             Average mood value or None if no data
         """
-        query = """
-        SELECT AVG(average_mood) as avg_mood 
-        FROM mood 
-        WHERE user_id = %s AND date BETWEEN %s AND %s;
-        """
-        results = self.execute_query(query, (user_id, start_date, end_date))
-        return results[0]['avg_mood'] if results and results[0]['avg_mood'] else None
+        full_start, full_end = _full_month_bounds(start_date, end_date)
+        results = self.execute_query(AVERAGE_MOOD_RANGE, {
+            "user_id": user_id,
+            "start_date": start_date,
+            "end_date": end_date,
+            "full_start": full_start,
+            "full_end": full_end,
+        })
+        return results[0]['avg_mood'] if results else None
     
     # ===== Connection Management =====
     
     def close(self):
-        """Close database connection."""
-        if self.cursor:
-            self.cursor.close()
-        if self.connection:
-            self.connection.close()
+        """Close all pooled database connections."""
+        if self.pool:
+            self.pool.closeall()
+            self.pool = None
     
     def __enter__(self):
         """Context manager entry."""
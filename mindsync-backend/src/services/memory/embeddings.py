@@ -1,27 +1,124 @@
 """
 Embedding Generator - Converts text to vectors
 """
+import asyncio
+from collections import OrderedDict
+from functools import lru_cache
 from sentence_transformers import SentenceTransformer
-from typing import List
+from typing import List, Optional, Tuple
+import numpy as np
+import torch
 from src.config.settings import get_settings
 
 settings = get_settings()
 
+@lru_cache(maxsize=1)
+def _load_model(name: str) -> SentenceTransformer:
+    """Load the sentence-transformer once per process"""
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model = SentenceTransformer(name, device=device)
+    if device == "cuda":
+        # Half precision on GPU; outputs are widened back to float32 in _encode
+        model.half()
+    return model
+
 class EmbeddingGenerator:
     def __init__(self):
-        self.model = SentenceTransformer(settings.EMBEDDING_MODEL)
+        self.model = _load_model(settings.EMBEDDING_MODEL)
+        # LRU cache of query embeddings, stored as raw float32 bytes
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        # Dynamic micro-batching of concurrent generate_text calls
+        self._queue: Optional[asyncio.Queue] = None
+        self._batcher: Optional[asyncio.Task] = None
+        # Bounds concurrent encode threads for large generate_batch calls
+        self._in_flight = asyncio.Semaphore(settings.EMBEDDING_MAX_IN_FLIGHT)
+    
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        embeddings = self.model.encode(
+            texts,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        return embeddings.astype(np.float32)
+    
+    def _remember(self, text: str, raw: bytes) -> None:
+        self._cache[text] = raw
+        self._cache.move_to_end(text)
+        if len(self._cache) > settings.EMBEDDING_CACHE_SIZE:
+            self._cache.popitem(last=False)
+    
+    async def _batch_loop(self) -> None:
+        """Encode queued texts together, flushing on batch size or wait budget"""
+        loop = asyncio.get_running_loop()
+        max_wait = settings.EMBEDDING_BATCH_WAIT_MS / 1000
+        while True:
+            batch: List[Tuple[str, asyncio.Future]] = [await self._queue.get()]
+            deadline = loop.time() + max_wait
+            while len(batch) < settings.EMBEDDING_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                embeddings = await asyncio.to_thread(self._encode, [text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for (text, future), embedding in zip(batch, embeddings):
+                raw = embedding.tobytes()
+                self._remember(text, raw)
+                if not future.done():
+                    future.set_result(raw)
     
-    async def generate_text(self, text: str) -> List[float]:
-        """Generate embedding for text"""
-        embedding = self.model.encode_text(text, convert_to_tensor=False)
-        return embedding.tolist()
+    async def generate_text(self, text: str) -> np.ndarray:
+        """Generate embedding for text as a read-only float32 vector"""
+        text = text.strip()
+        raw = self._cache.get(text)
+        if raw is not None:
+            self._cache.move_to_end(text)
+        else:
+            if self._batcher is None or self._batcher.done():
+                self._queue = asyncio.Queue()
+                self._batcher = asyncio.create_task(self._batch_loop())
+            future = asyncio.get_running_loop().create_future()
+            await self._queue.put((text, future))
+            raw = await future
+        return np.frombuffer(raw, dtype=np.float32)
     
-    async def generate_photos(self, photo_path: str) -> List[float]:
+    async def generate_photos(self, photo_path: str) -> np.ndarray:
         """Generate embedding for photos"""
-        embedding = self.model.encode_photo(photo_path, convert_to_tensor=False)
-        return embedding.tolist()
-        
-    async def generate_batch(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for multiple texts"""
-        embeddings = self.model.encode(texts, convert_to_tensor=False)
-        return embeddings.tolist()
+        embedding = await asyncio.to_thread(self.model.encode_photo, photo_path, convert_to_tensor=False)
+        return np.asarray(embedding, dtype=np.float32)
+    
+    async def _encode_chunk(self, texts: List[str]) -> np.ndarray:
+        async with self._in_flight:
+            return await asyncio.to_thread(self._encode, texts)
+    
+    async def generate_batch(self, texts: List[str]) -> np.ndarray:
+        """Generate embeddings for multiple texts, in bounded concurrent sub-batches"""
+        size = settings.EMBEDDING_CHUNK_SIZE
+        if len(texts) <= size:
+            return await self._encode_chunk(texts)
+        chunks = await asyncio.gather(*(
+            self._encode_chunk(texts[start:start + size])
+            for start in range(0, len(texts), size)
+        ))
+        return np.concatenate(chunks)
+
+_embedding_generator = None
+
+def get_embedding_generator() -> EmbeddingGenerator:
+    """Shared generator, so the query cache and micro-batcher span requests"""
+    global _embedding_generator
+    if _embedding_generator is None:
+        _embedding_generator = EmbeddingGenerator()
+    return _embedding_generator
@@ -1,30 +1,162 @@
 """
 Memory Service - Handles memory storage and retrieval
 """
-from typing import List, Optional
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
 from src.services.memory.vector_store import VectorStore
-from src.services.memory.embeddings import EmbeddingGenerator
+from src.services.memory.embeddings import get_embedding_generator
 from src.models.schemas.memory import Memory, MemoryCreate
+from src.config.settings import get_settings
+
+settings = get_settings()
+
+class RecallCoalescer:
+    """Groups concurrent recalls for the same user into one multi-embedding query"""
+    
+    def __init__(self):
+        self._pending: Dict[Tuple[str, int], List[Tuple[np.ndarray, asyncio.Future]]] = {}
+        # The event loop only keeps weak references to tasks; hold flushes until they finish
+        self._tasks: Set[asyncio.Task] = set()
+    
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def search(
+        self,
+        vector_store: VectorStore,
+        user_id: str,
+        query_embedding: np.ndarray,
+        top_k: int
+    ) -> Dict:
+        key = (user_id, top_k)
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = []
+            self._spawn(self._flush_after_window(vector_store, key, batch))
+        
+        future = asyncio.get_running_loop().create_future()
+        batch.append((query_embedding, future))
+        if len(batch) >= settings.RECALL_MAX_BATCH:
+            # Detach now so later callers start a new batch instead of overfilling this one
+            del self._pending[key]
+            self._spawn(self._flush(vector_store, key, batch))
+        return await future
+    
+    async def _flush_after_window(self, vector_store: VectorStore, key: Tuple[str, int], batch: list) -> None:
+        await asyncio.sleep(settings.RECALL_BATCH_WINDOW_MS / 1000)
+        # A batch that filled up was already detached and flushed; leave any newer one alone
+        if self._pending.get(key) is not batch:
+            return
+        del self._pending[key]
+        await self._flush(vector_store, key, batch)
+    
+    async def _flush(self, vector_store: VectorStore, key: Tuple[str, int], batch: list) -> None:
+        user_id, top_k = key
+        try:
+            results = await vector_store.search_many(
+                user_id=user_id,
+                query_embeddings=[embedding for embedding, _ in batch],
+                top_k=top_k
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+# Shared across MemoryService instances, which are created per request
+recall_coalescer = RecallCoalescer()
+
+# Most common one-word mood contexts, embedded once at startup
+CANONICAL_MOODS = (
+    "happy", "sad", "anxious", "stressed", "lonely", "angry", "tired", "calm",
+    "excited", "grateful", "hopeful", "nervous", "overwhelmed", "bored", "content",
+    "frustrated", "scared", "depressed", "relaxed", "proud",
+)
+_mood_embeddings: Dict[str, np.ndarray] = {}
+
+async def load_mood_embeddings() -> None:
+    """Precompute embeddings for CANONICAL_MOODS in one batch"""
+    embeddings = await get_embedding_generator().generate_batch(list(CANONICAL_MOODS))
+    for mood, embedding in zip(CANONICAL_MOODS, embeddings):
+        embedding.flags.writeable = False
+        _mood_embeddings[mood] = embedding
 
 class MemoryService:
     def __init__(self):
         self.vector_store = VectorStore()
-        self.embedding_generator = EmbeddingGenerator()
+        self.embedding_generator = get_embedding_generator()
     
     async def store_memory(self, user_id: str, memory: MemoryCreate) -> Memory:
         """Store a new positive memory"""
+        payload = memory.model_dump()
+        
         # Generate embedding
-        embedding = await self.embedding_generator.generate(memory.content)
+        embedding = await self.embedding_generator.generate_text(payload["content"])
         
         # Store in vector database
         memory_id = await self.vector_store.add(
             user_id=user_id,
-            content=memory.content,
+            content=payload["content"],
             embedding=embedding,
-            metadata=memory.metadata
+            metadata=payload.get("metadata") or {}
         )
         
-        return Memory(id=memory_id, **memory.dict())
+        return Memory(id=memory_id, user_id=user_id, created_at=datetime.now(), **payload)
+    
+    async def store_memories(self, user_id: str, memories: List[MemoryCreate]) -> List[Memory]:
+        """Store several positive memories, overlapping embedding with vector store writes"""
+        if not memories:
+            return []
+        
+        size = settings.EMBEDDING_CHUNK_SIZE
+        chunks = [memories[start:start + size] for start in range(0, len(memories), size)]
+        chunk_ids: List[List[str]] = [[] for _ in chunks]
+        # Bounded so embedding can't run arbitrarily far ahead of the writes
+        upsert_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.INGEST_QUEUE_SIZE)
+        
+        async def embed_stage():
+            for index, chunk in enumerate(chunks):
+                embeddings = await self.embedding_generator.generate_batch(
+                    [memory.content for memory in chunk]
+                )
+                await upsert_queue.put((index, chunk, embeddings))
+            await upsert_queue.put(None)
+        
+        async def upsert_stage():
+            while (item := await upsert_queue.get()) is not None:
+                index, chunk, embeddings = item
+                chunk_ids[index] = await self.vector_store.add_many(
+                    user_id=user_id,
+                    contents=[memory.content for memory in chunk],
+                    embeddings=embeddings,
+                    metadatas=[memory.metadata or {} for memory in chunk]
+                )
+        
+        # Not atomic: if a stage fails, chunks already upserted stay in the vector
+        # store. The caller gets the first underlying error, not the TaskGroup's
+        # ExceptionGroup wrapper
+        try:
+            async with asyncio.TaskGroup() as group:
+                group.create_task(embed_stage())
+                group.create_task(upsert_stage())
+        except BaseExceptionGroup as errors:
+            raise errors.exceptions[0] from None
+        
+        created_at = datetime.now()
+        return [
+            Memory(id=memory_id, user_id=user_id, created_at=created_at, **memory.model_dump())
+            for chunk, ids in zip(chunks, chunk_ids)
+            for memory_id, memory in zip(ids, chunk)
+        ]
     
     async def recall_memories(
         self, 
@@ -33,11 +165,14 @@ class MemoryService:
         top_k: int = 5
     ) -> List[Memory]:
         """Retrieve relevant positive memories based on current mood"""
-        # Generate query embedding
-        query_embedding = await self.embedding_generator.generate(mood_context)
+        # Canonical moods are a plain lookup; anything else goes through the encoder
+        query_embedding = _mood_embeddings.get(mood_context.strip().lower())
+        if query_embedding is None:
+            query_embedding = await self.embedding_generator.generate_text(mood_context)
         
-        # Search vector store
-        results = await self.vector_store.search(
+        # Search vector store, sharing one query with concurrent recalls for this user
+        results = await recall_coalescer.search(
+            self.vector_store,
             user_id=user_id,
             query_embedding=query_embedding,
             top_k=top_k
@@ -45,6 +180,24 @@ class MemoryService:
         
         return results
     
+    async def recall_memories_batch(
+        self,
+        user_id: str,
+        mood_contexts: List[str],
+        top_k: int = 5
+    ) -> List[Dict]:
+        """Retrieve memories for several mood contexts with one embedding pass and one query"""
+        if not mood_contexts:
+            return []
+        
+        query_embeddings = await self.embedding_generator.generate_batch(mood_contexts)
+        
+        return await self.vector_store.search_many(
+            user_id=user_id,
+            query_embeddings=query_embeddings,
+            top_k=top_k
+        )
+    
     async def delete_memory(self, user_id: str, memory_id: str) -> bool:
         """Delete a memory"""
         return await self.vector_store.delete(user_id, memory_id)
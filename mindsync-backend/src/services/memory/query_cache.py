@@ -0,0 +1,45 @@
+"""
+Query Cache - Thread-safe LRU + TTL cache for vector search results
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+class QueryCache:
+    def __init__(self, max_size: int = 2000, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+    
+    def get(self, user_id: str, key: Hashable) -> Optional[Any]:
+        """Return a fresh cached value, or None"""
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[(user_id, key)]
+                return None
+            self._entries.move_to_end((user_id, key))
+            return value
+    
+    def put(self, user_id: str, key: Hashable, value: Any) -> None:
+        """Cache a value, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[(user_id, key)] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end((user_id, key))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def invalidate_user(self, user_id: str) -> None:
+        """Drop every cached entry for a user"""
+        with self._lock:
+            for entry_key in [k for k in self._entries if k[0] == user_id]:
+                del self._entries[entry_key]
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -1,63 +1,221 @@
 """
 Vector Store - Manages ChromaDB/Pinecone operations
 """
+import asyncio
+import hashlib
+import re
+from functools import lru_cache
 import chromadb
-from chromadb.config import Settings
-from typing import List, Dict, Any
+import numpy as np
+from chromadb.api import ClientAPI
+from chromadb.api.models.Collection import Collection
+from typing import Any, Callable, Dict, List, Optional, TypeVar, Union
+from uuid_utils import uuid7
 from src.config.settings import get_settings
+from src.services.memory.query_cache import QueryCache
 
 settings = get_settings()
 
+# Vectors are converted once to float32 arrays on entry; plain lists are still accepted
+Embedding = Union[np.ndarray, List[float]]
+Embeddings = Union[np.ndarray, List[np.ndarray], List[List[float]]]
+
+# Index parameters only take effect when a collection is first created.
+# Embeddings are unit-normalized, so cosine matches how they were trained.
+HNSW_PARAMS = {
+    "hnsw:space": "cosine",
+    "hnsw:construction_ef": 200,
+    "hnsw:M": 32,
+    "hnsw:search_ef": 64
+}
+
+# Chroma collection names: 3-63 chars of [a-zA-Z0-9._-], alphanumeric at both ends
+_COLLECTION_NAME = re.compile(r"[a-zA-Z0-9][a-zA-Z0-9._-]{1,61}[a-zA-Z0-9]")
+
+def _collection_name(user_id: str) -> str:
+    """Per-user collection name, hashed when the raw id isn't a valid name"""
+    name = f"user_{user_id}"
+    if _COLLECTION_NAME.fullmatch(name) and ".." not in name:
+        return name
+    return "user_" + hashlib.sha1(user_id.encode("utf-8")).hexdigest()
+
+@lru_cache(maxsize=1)
+def _chroma_client() -> ClientAPI:
+    """Process-wide Chroma client: embedded SQLite+HNSW, or a Chroma server"""
+    if settings.CHROMA_MODE == "http":
+        return chromadb.HttpClient(host=settings.CHROMA_HOST, port=settings.CHROMA_PORT)
+    return chromadb.PersistentClient(path=settings.CHROMA_PERSIST_DIR)
+
+T = TypeVar("T")
+
+# Caps Chroma worker threads so concurrent requests don't pile onto the SQLite backend
+_chroma_slots = asyncio.Semaphore(settings.CHROMA_MAX_CONCURRENCY)
+
+async def _run_chroma(func: Callable[..., T], *args, **kwargs) -> T:
+    """Run a blocking Chroma call on a worker thread, bounded by _chroma_slots"""
+    async with _chroma_slots:
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+# Shared across VectorStore instances, which are created per request
+query_cache = QueryCache(
+    max_size=settings.QUERY_CACHE_SIZE,
+    ttl=settings.QUERY_CACHE_TTL_SECONDS
+)
+
+# Opened collections, shared across VectorStore instances like the client itself
+_collections: Dict[str, Collection] = {}
+
+def _empty_result() -> Dict:
+    """Single-query result for a user with no stored memories"""
+    return {"ids": [[]], "embeddings": None, "documents": [[]], "metadatas": [[]], "distances": [[]]}
+
 class VectorStore:
     def __init__(self):
-        self.client = chromadb.Client(Settings(
-            chroma_db_impl="duckdb+parquet",
-            persist_directory=settings.CHROMA_PERSIST_DIR
-        ))
-        self.collection = self.client.get_or_create_collection(
-            name="positive_memories",
-            metadata={"description": "User positive memories for recall"}
-        )
+        self.client = _chroma_client()
+    
+    def _open_collection(self, user_id: str, create: bool) -> Optional[Collection]:
+        # One collection per user keeps each HNSW graph small and removes where-filtering
+        name = _collection_name(user_id)
+        if create:
+            collection = self.client.get_or_create_collection(
+                name=name,
+                metadata={
+                    "description": "User positive memories for recall",
+                    **HNSW_PARAMS
+                }
+            )
+        else:
+            try:
+                collection = self.client.get_collection(name=name)
+            except Exception as e:
+                # Embedded Chroma raises ValueError; HttpClient re-raises the server's message
+                if "does not exist" not in str(e):
+                    raise
+                return None
+        _collections[user_id] = collection
+        return collection
+    
+    async def _collection(self, user_id: str, create: bool = True) -> Optional[Collection]:
+        """The user's collection; reads pass create=False so they never create one"""
+        collection = _collections.get(user_id)
+        if collection is None:
+            collection = await _run_chroma(self._open_collection, user_id, create)
+        return collection
     
     async def add(
         self, 
         user_id: str, 
         content: str, 
-        embedding: List[float],
+        embedding: Embedding,
         metadata: Dict[str, Any]
     ) -> str:
         """Add memory to vector store"""
-        import uuid
-        memory_id = str(uuid.uuid4())
-        
-        self.collection.add(
-            ids=[memory_id],
+        memory_ids = await self.add_many(
+            user_id=user_id,
+            contents=[content],
             embeddings=[embedding],
-            documents=[content],
-            metadatas=[{**metadata, "user_id": user_id}]
+            metadatas=[metadata]
         )
+        return memory_ids[0]
+    
+    async def add_many(
+        self,
+        user_id: str,
+        contents: List[str],
+        embeddings: Embeddings,
+        metadatas: List[Dict[str, Any]],
+        batch_size: int = 128
+    ) -> List[str]:
+        """Add several memories to vector store, batch_size records per Chroma write"""
+        # Time-ordered ids keep Chroma's SQLite inserts at the right edge of its indexes
+        memory_ids = [str(uuid7()) for _ in contents]
         
-        return memory_id
+        collection = await self._collection(user_id)
+        await _run_chroma(
+            self._add_batches,
+            collection,
+            memory_ids,
+            # Chroma 0.4 validates embeddings as plain lists
+            np.asarray(embeddings, dtype=np.float32).tolist(),
+            list(contents),
+            [{**metadata, "user_id": user_id} for metadata in metadatas],
+            batch_size
+        )
+        
+        query_cache.invalidate_user(user_id)
+        return memory_ids
+    
+    def _add_batches(
+        self,
+        collection: Collection,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+        batch_size: int
+    ) -> None:
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            collection.add(
+                ids=ids[start:end],
+                embeddings=embeddings[start:end],
+                documents=documents[start:end],
+                metadatas=metadatas[start:end]
+            )
     
     async def search(
         self,
         user_id: str,
-        query_embedding: List[float],
+        query_embedding: Embedding,
         top_k: int = 5
     ) -> List[Dict]:
         """Search for similar memories"""
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k,
-            where={"user_id": user_id}
+        results = await self.search_many(user_id, [query_embedding], top_k)
+        return results[0]
+    
+    async def search_many(
+        self,
+        user_id: str,
+        query_embeddings: Embeddings,
+        top_k: int = 5
+    ) -> List[Dict]:
+        """Search for several queries in one call, one result set per query"""
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        cache_keys = [
+            (hashlib.sha1(embedding.tobytes()).hexdigest(), top_k)
+            for embedding in query_embeddings
+        ]
+        results: List[Optional[Dict]] = [query_cache.get(user_id, key) for key in cache_keys]
+        misses = [i for i, result in enumerate(results) if result is None]
+        if not misses:
+            return results
+        
+        collection = await self._collection(user_id, create=False)
+        if collection is None:
+            for i in misses:
+                results[i] = _empty_result()
+            return results
+        queried = await _run_chroma(
+            collection.query,
+            query_embeddings=query_embeddings[misses].tolist(),
+            n_results=top_k
         )
         
+        # Split Chroma's per-query columns into one single-query result each
+        for column, i in enumerate(misses):
+            result = {key: None if value is None else [value[column]] for key, value in queried.items()}
+            query_cache.put(user_id, cache_keys[i], result)
+            results[i] = result
         return results
     
     async def delete(self, user_id: str, memory_id: str) -> bool:
         """Delete a memory"""
         try:
-            self.collection.delete(ids=[memory_id])
+            collection = await self._collection(user_id, create=False)
+            if collection is None:
+                return False
+            await _run_chroma(collection.delete, ids=[memory_id])
+            query_cache.invalidate_user(user_id)
             return True
         except Exception:
             return False
@@ -1,20 +1,19 @@
+import asyncio
 import pytest
-import tempfile
-import shutil
-from pathlib import Path
 from io import BytesIO
 from src.services.database.object_storage_service import ObjectStorageService
 DIR_PATH = "./data/database/object_storage"
 
+@pytest.fixture(scope="session")
+def _storage_root(tmp_path_factory):
+    """Storage root shared by the whole test session."""
+    return tmp_path_factory.mktemp("obj")
+
 @pytest.fixture
-def temp_storage():
-    """Create a temporary storage directory for testing."""
-    temp_dir = tempfile.mkdtemp()
-    original_dir_path = ObjectStorageService.__init__.__code__.co_consts
-    
-    # Create test instance with temp directory
+def temp_storage(_storage_root):
+    """Create a storage service over the shared root, emptied after each test."""
     service = ObjectStorageService()
-    service.dir_path = Path(temp_dir)
+    service.dir_path = _storage_root
     service.video_dir = service.dir_path / "video"
     service.audio_dir = service.dir_path / "audio"
     service.text_dir = service.dir_path / "text"
@@ -26,8 +25,13 @@ def temp_storage():
     
     yield service
     
-    # Cleanup
-    shutil.rmtree(temp_dir)
+    # Cleanup: remove files but keep the directories for the next test
+    for entry in _storage_root.iterdir():
+        if entry.is_dir():
+            for path in entry.iterdir():
+                path.unlink()
+        else:
+            entry.unlink()
 
 
 class TestObjectStorageService:
@@ -39,71 +43,32 @@ class TestObjectStorageService:
         assert temp_storage.text_dir.exists()
         assert temp_storage.photo_dir.exists()
     
-    # ===== Video Upload Tests =====
+    # ===== Video, Audio and Photo Upload Tests =====
     
-    def test_upload_video_from_bytes(self, temp_storage):
-        """Test uploading video from bytes."""
-        video_data = b"fake video data content"
-        filename = "test_video.mp4"
-        
-        result = temp_storage.upload_video(video_data, filename)
+    @pytest.mark.parametrize("source_kind", ["bytes", "file_obj", "path"])
+    @pytest.mark.parametrize("kind,upload_attr,dir_attr,ext", [
+        ("video", "upload_video", "video_dir", ".mp4"),
+        ("audio", "upload_audio", "audio_dir", ".mp3"),
+        ("photo", "upload_photo", "photo_dir", ".jpg"),
+    ])
+    def test_upload_media(self, temp_storage, tmp_path, kind, upload_attr, dir_attr, ext, source_kind):
+        """Test uploading each media type from bytes, a file-like object or a path."""
+        data = f"fake {kind} data from {source_kind}".encode()
+        filename = f"test_{kind}{ext}"
+        if source_kind == "bytes":
+            source = data
+        elif source_kind == "file_obj":
+            source = BytesIO(data)
+        else:
+            source = tmp_path / f"source{ext}"
+            source.write_bytes(data)
+        
+        result = getattr(temp_storage, upload_attr)(source, filename)
         
         assert result.exists()
         assert result.name == filename
-        assert result.parent == temp_storage.video_dir
-        assert result.read_bytes() == video_data
-    
-    def test_upload_video_from_file_object(self, temp_storage):
-        """Test uploading video from file-like object."""
-        video_data = b"video content from file object"
-        file_obj = BytesIO(video_data)
-        filename = "stream_video.mp4"
-        
-        result = temp_storage.upload_video(file_obj, filename)
-        
-        assert result.exists()
-        assert result.read_bytes() == video_data
-    
-    def test_upload_video_from_path(self, temp_storage):
-        """Test uploading video from existing file path."""
-        # Create a temporary source file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp:
-            tmp.write(b"source video content")
-            source_path = tmp.name
-        
-        try:
-            filename = "copied_video.mp4"
-            result = temp_storage.upload_video(source_path, filename)
-            
-            assert result.exists()
-            assert result.read_bytes() == b"source video content"
-        finally:
-            Path(source_path).unlink()
-    
-    # ===== Audio Upload Tests =====
-    
-    def test_upload_audio_from_bytes(self, temp_storage):
-        """Test uploading audio from bytes."""
-        audio_data = b"fake audio data"
-        filename = "test_audio.mp3"
-        
-        result = temp_storage.upload_audio(audio_data, filename)
-        
-        assert result.exists()
-        assert result.name == filename
-        assert result.parent == temp_storage.audio_dir
-        assert result.read_bytes() == audio_data
-    
-    def test_upload_audio_from_file_object(self, temp_storage):
-        """Test uploading audio from file-like object."""
-        audio_data = b"audio stream content"
-        file_obj = BytesIO(audio_data)
-        filename = "stream_audio.wav"
-        
-        result = temp_storage.upload_audio(file_obj, filename)
-        
-        assert result.exists()
-        assert result.read_bytes() == audio_data
+        assert result.parent == getattr(temp_storage, dir_attr)
+        assert result.read_bytes() == data
     
     # ===== Text Upload Tests =====
     
@@ -139,46 +104,6 @@ class TestObjectStorageService:
         assert result.exists()
         assert result.read_text(encoding='utf-8') == text_data
     
-    # ===== Photo Upload Tests =====
-    
-    def test_upload_photo_from_bytes(self, temp_storage):
-        """Test uploading photo from bytes."""
-        photo_data = b"fake image binary data"
-        filename = "test_photo.jpg"
-        
-        result = temp_storage.upload_photo(photo_data, filename)
-        
-        assert result.exists()
-        assert result.name == filename
-        assert result.parent == temp_storage.photo_dir
-        assert result.read_bytes() == photo_data
-    
-    def test_upload_photo_from_file_object(self, temp_storage):
-        """Test uploading photo from file-like object."""
-        photo_data = b"photo stream content"
-        file_obj = BytesIO(photo_data)
-        filename = "stream_photo.png"
-        
-        result = temp_storage.upload_photo(file_obj, filename)
-        
-        assert result.exists()
-        assert result.read_bytes() == photo_data
-    
-    def test_upload_photo_from_path(self, temp_storage):
-        """Test uploading photo from existing file path."""
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp:
-            tmp.write(b"source photo content")
-            source_path = tmp.name
-        
-        try:
-            filename = "copied_photo.jpg"
-            result = temp_storage.upload_photo(source_path, filename)
-            
-            assert result.exists()
-            assert result.read_bytes() == b"source photo content"
-        finally:
-            Path(source_path).unlink()
-    
     # ===== Edge Cases and Error Handling =====
     
     def test_upload_overwrites_existing_file(self, temp_storage):
@@ -210,16 +135,19 @@ class TestObjectStorageService:
         assert result.exists()
         assert result.read_text() == ""
     
-    def test_upload_large_file(self, temp_storage):
+    def test_upload_large_file(self, temp_storage, tmp_path):
         """Test uploading a large file."""
-        # Create 10MB of data
-        large_data = b"x" * (10 * 1024 * 1024)
+        # Sparse 10MB source, so the payload is never held in memory
+        size = 10 * 1024 * 1024
+        source = tmp_path / "big.bin"
+        with source.open("wb") as f:
+            f.truncate(size)
         filename = "large_video.mp4"
         
-        result = temp_storage.upload_video(large_data, filename)
+        result = temp_storage.upload_video(source, filename)
         
         assert result.exists()
-        assert result.stat().st_size == len(large_data)
+        assert result.stat().st_size == size
     
     def test_multiple_uploads_same_type(self, temp_storage):
         """Test uploading multiple files of the same type."""
@@ -301,5 +229,62 @@ class TestObjectStorageService:
         text_files = list(temp_storage.text_dir.glob(filename))
         assert len(text_files) == 1
 
+    # ===== Content Deduplication Tests =====
+
+    def test_identical_content_stored_once(self, temp_storage):
+        """Test that identical uploads under different names share one blob."""
+        data = b"same photo bytes"
+        
+        first = temp_storage.upload_photo(data, "a.jpg")
+        second = temp_storage.upload_photo(BytesIO(data), "b.jpg")
+        
+        assert first.read_bytes() == second.read_bytes() == data
+        assert first.stat().st_ino == second.stat().st_ino
+        assert len(list((temp_storage.dir_path / "blobs").iterdir())) == 1
+
+    def test_overwrite_does_not_change_shared_content(self, temp_storage):
+        """Test that overwriting one name leaves other names with the same content intact."""
+        temp_storage.upload_audio(b"shared", "one.wav")
+        other = temp_storage.upload_audio(b"shared", "two.wav")
+        
+        temp_storage.upload_audio(b"replacement", "one.wav")
+        
+        assert other.read_bytes() == b"shared"
+        assert (temp_storage.audio_dir / "one.wav").read_bytes() == b"replacement"
+
+    def test_overwrite_releases_unreferenced_blob(self, temp_storage):
+        """Test that overwriting a name deletes the old blob once nothing else uses it."""
+        for i in range(5):
+            temp_storage.upload_video(f"clip version {i}".encode(), "clip.mp4")
+        
+        assert len(list((temp_storage.dir_path / "blobs").iterdir())) == 1
+        assert (temp_storage.video_dir / "clip.mp4").read_bytes() == b"clip version 4"
+
+    def test_overwrite_with_same_content_keeps_blob(self, temp_storage):
+        """Test that re-uploading identical content under the same name keeps its blob."""
+        temp_storage.upload_photo(b"unchanged", "same.jpg")
+        result = temp_storage.upload_photo(BytesIO(b"unchanged"), "same.jpg")
+        
+        assert result.read_bytes() == b"unchanged"
+        assert len(list((temp_storage.dir_path / "blobs").iterdir())) == 1
+
+    # ===== Async Upload Tests =====
+
+    def test_upload_video_async_from_file_object(self, temp_storage):
+        """Test async upload streams a file-like object to disk."""
+        video_data = b"v" * (3 * 1024 * 1024 + 17)
+        
+        result = asyncio.run(temp_storage.upload_video_async(BytesIO(video_data), "async_video.mp4"))
+        
+        assert result.parent == temp_storage.video_dir
+        assert result.read_bytes() == video_data
+
+    def test_upload_text_async(self, temp_storage):
+        """Test async text upload matches the sync variant."""
+        result = asyncio.run(temp_storage.upload_text_async("Async text 🙂", "async.txt"))
+        
+        assert result.parent == temp_storage.text_dir
+        assert result.read_text(encoding='utf-8') == "Async text 🙂"
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
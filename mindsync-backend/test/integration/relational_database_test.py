@@ -0,0 +1,102 @@
+import os
+import random
+import uuid
+import pytest
+from datetime import date, timedelta
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+from src.services.database.relational_database_service import RelationalDatabaseService
+
+DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="TEST_DATABASE_URL not set")
+
+
+@pytest.fixture
+def db():
+    """Service over a throwaway schema in the TEST_DATABASE_URL database."""
+    schema = f"test_{uuid.uuid4().hex}"
+    admin = psycopg2.connect(DATABASE_URL)
+    admin.autocommit = True
+    with admin.cursor() as cursor:
+        cursor.execute(f"CREATE SCHEMA {schema};")
+    
+    service = RelationalDatabaseService({"dsn": DATABASE_URL, "options": f"-c search_path={schema}"})
+    service.initialize_tables()
+    
+    yield service
+    
+    service.close()
+    with admin.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA {schema} CASCADE;")
+    admin.close()
+
+
+def plain_average(db, user_id, start, end):
+    rows = db.execute_query(
+        "SELECT AVG(average_mood) AS avg_mood FROM mood WHERE user_id = %s AND date BETWEEN %s AND %s;",
+        (user_id, start, end)
+    )
+    return rows[0]['avg_mood']
+
+
+class TestMoodRollup:
+    
+    def test_rollup_matches_plain_average(self, db):
+        """Test rollup-based range averages against AVG over the daily rows."""
+        user_id = db.create_user("Ada", "ada@example.com")
+        rng = random.Random(0)
+        first = date(2023, 11, 1)
+        for offset in range(200):
+            if rng.random() < 0.7:
+                db.add_mood(user_id, round(rng.uniform(0, 10), 2), first + timedelta(days=offset))
+        
+        ranges = [
+            (date(2024, 1, 5), date(2024, 1, 20)),    # inside one month
+            (date(2024, 1, 1), date(2024, 1, 20)),    # starts on the 1st
+            (date(2024, 1, 5), date(2024, 1, 31)),    # ends on the last day
+            (date(2024, 2, 1), date(2024, 2, 29)),    # one whole (leap) month
+            (date(2023, 11, 15), date(2024, 4, 10)),  # edges around whole months
+            (date(2023, 12, 31), date(2024, 1, 1)),   # across the year boundary
+        ]
+        for _ in range(20):
+            start = first + timedelta(days=rng.randrange(200))
+            ranges.append((start, start + timedelta(days=rng.randrange(120))))
+        
+        for start, end in ranges:
+            expected = plain_average(db, user_id, start, end)
+            actual = db.get_average_mood_range(user_id, start, end)
+            if expected is None:
+                assert actual is None
+            else:
+                assert actual == pytest.approx(expected), (start, end)
+    
+    def test_trigger_follows_updates_and_deletes(self, db):
+        """Test that upserts, updates and deletes on mood keep the rollup in step."""
+        user_id = db.create_user("Ada", "ada@example.com")
+        march = (date(2024, 3, 1), date(2024, 3, 31))
+        for day in range(1, 32):
+            db.add_mood(user_id, 5.0, date(2024, 3, day))
+        
+        db.add_mood(user_id, 9.0, date(2024, 3, 10))       # upsert over an existing day
+        db.update_mood(user_id, date(2024, 3, 11), 1.0)
+        db.delete_mood(user_id, date(2024, 3, 12))
+        
+        assert db.get_average_mood_range(user_id, *march) == pytest.approx(plain_average(db, user_id, *march))
+        rollup = db.execute_query(
+            "SELECT mood_sum, mood_count FROM mood_rollup_monthly WHERE user_id = %s;", (user_id,)
+        )
+        assert rollup == [{"mood_sum": pytest.approx(5.0 * 28 + 9.0 + 1.0), "mood_count": 30}]
+    
+    def test_backfill_on_first_initialize(self, db):
+        """Test that rows written before the rollup existed are backfilled once."""
+        user_id = db.create_user("Ada", "ada@example.com")
+        db.add_mood(user_id, 4.0, date(2024, 5, 1))
+        db.add_mood(user_id, 8.0, date(2024, 5, 31))
+        db.execute_query("DROP TABLE mood_rollup_monthly;")
+        
+        db.initialize_tables()
+        db.initialize_tables()
+        
+        assert db.get_average_mood_range(user_id, date(2024, 5, 1), date(2024, 5, 31)) == pytest.approx(6.0)
@@ -0,0 +1,149 @@
+import asyncio
+import threading
+import time
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from src.services.memory import embeddings
+from src.services.memory.embeddings import EmbeddingGenerator
+
+
+class RecordingEncoder:
+    
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+        self.active = 0
+        self.max_active = 0
+        self.fail_next = False
+        self._lock = threading.Lock()
+    
+    def __call__(self, texts):
+        with self._lock:
+            self.batches.append(list(texts))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            fail, self.fail_next = self.fail_next, False
+        try:
+            time.sleep(self.delay)
+            if fail:
+                raise RuntimeError("encoder failed")
+            return np.array([vector(text) for text in texts], dtype=np.float32)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def vector(text):
+    return [float(len(text)), float(sum(map(ord, text)))]
+
+
+@pytest.fixture
+def make_generator(monkeypatch):
+    monkeypatch.setattr(embeddings, "_load_model", lambda name: None)
+    
+    def make(encoder=None, **overrides):
+        for name, value in overrides.items():
+            monkeypatch.setattr(embeddings.settings, name, value)
+        generator = EmbeddingGenerator()
+        generator._encode = encoder or RecordingEncoder()
+        return generator
+    
+    return make
+
+
+class TestGenerateText:
+    
+    def test_concurrent_calls_share_one_encode(self, make_generator):
+        """Test that concurrent generate_text calls are encoded together and routed back to their callers."""
+        generator = make_generator(EMBEDDING_BATCH_WAIT_MS=50)
+        texts = ["happy", "sad", "a long walk", "tired", "ok"]
+        
+        async def main():
+            return await asyncio.gather(*(generator.generate_text(text) for text in texts))
+        
+        results = asyncio.run(main())
+        
+        assert generator._encode.batches == [texts]
+        for text, result in zip(texts, results):
+            assert result.tolist() == vector(text)
+    
+    def test_flushes_at_batch_size(self, make_generator):
+        """Test that the micro-batcher never sends more than EMBEDDING_BATCH_SIZE texts at once."""
+        generator = make_generator(EMBEDDING_BATCH_WAIT_MS=50, EMBEDDING_BATCH_SIZE=2)
+        texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+        
+        async def main():
+            return await asyncio.gather(*(generator.generate_text(text) for text in texts))
+        
+        results = asyncio.run(main())
+        
+        assert generator._encode.batches == [["a", "bb"], ["ccc", "dddd"], ["eeeee"]]
+        assert [result.tolist() for result in results] == [vector(text) for text in texts]
+    
+    def test_cache_hit_skips_encoder(self, make_generator):
+        """Test that a repeated text, after stripping, is served from the cache as a read-only vector."""
+        generator = make_generator()
+        
+        first = asyncio.run(generator.generate_text("happy"))
+        second = asyncio.run(generator.generate_text("  happy "))
+        
+        assert generator._encode.batches == [["happy"]]
+        assert second.tolist() == first.tolist() == vector("happy")
+        assert not second.flags.writeable
+    
+    def test_cache_evicts_least_recently_used(self, make_generator):
+        """Test that the cache keeps at most EMBEDDING_CACHE_SIZE texts, dropping the least recently used."""
+        generator = make_generator(EMBEDDING_CACHE_SIZE=2)
+        
+        async def main():
+            for text in ["a", "b", "a", "c", "a", "b"]:
+                await generator.generate_text(text)
+        
+        asyncio.run(main())
+        
+        assert generator._encode.batches == [["a"], ["b"], ["c"], ["b"]]
+        assert list(generator._cache) == ["a", "b"]
+    
+    def test_encoder_error_reaches_callers(self, make_generator):
+        """Test that a failed encode is raised to each waiting caller and the batcher keeps serving."""
+        encoder = RecordingEncoder()
+        encoder.fail_next = True
+        generator = make_generator(encoder, EMBEDDING_BATCH_WAIT_MS=50)
+        
+        async def main():
+            failed = await asyncio.gather(
+                generator.generate_text("a"), generator.generate_text("b"), return_exceptions=True
+            )
+            return failed, await generator.generate_text("a")
+        
+        failed, retried = asyncio.run(main())
+        
+        assert [type(error) for error in failed] == [RuntimeError, RuntimeError]
+        assert retried.tolist() == vector("a")
+
+
+class TestGenerateBatch:
+    
+    def test_small_batch_single_encode(self, make_generator):
+        """Test that a batch within EMBEDDING_CHUNK_SIZE is one encode call."""
+        generator = make_generator(EMBEDDING_CHUNK_SIZE=4)
+        
+        result = asyncio.run(generator.generate_batch(["a", "bb", "ccc"]))
+        
+        assert generator._encode.batches == [["a", "bb", "ccc"]]
+        assert result.tolist() == [vector(text) for text in ["a", "bb", "ccc"]]
+    
+    def test_large_batch_split_and_bounded(self, make_generator):
+        """Test that a large batch is split into chunks, encoded at most EMBEDDING_MAX_IN_FLIGHT at a time, and rejoined in order."""
+        encoder = RecordingEncoder(delay=0.02)
+        generator = make_generator(encoder, EMBEDDING_CHUNK_SIZE=2, EMBEDDING_MAX_IN_FLIGHT=2)
+        texts = [str(index) * (index + 1) for index in range(11)]
+        
+        result = asyncio.run(generator.generate_batch(texts))
+        
+        assert sorted(len(batch) for batch in encoder.batches) == [1, 2, 2, 2, 2, 2]
+        assert encoder.max_active == 2
+        assert result.tolist() == [vector(text) for text in texts]
@@ -0,0 +1,234 @@
+import asyncio
+import numpy as np
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("sentence_transformers")
+
+from src.services.memory import memory_service
+from src.services.memory.memory_service import MemoryService, RecallCoalescer
+from src.models.schemas.memory import MemoryCreate
+
+
+class FakeVectorStore:
+    def __init__(self, fail_on_add_call=None):
+        self.fail_on_add_call = fail_on_add_call
+        self.added = []
+        self.searches = []
+        self.fail_search = False
+    
+    async def add_many(self, user_id, contents, embeddings, metadatas):
+        await asyncio.sleep(0)
+        if len(self.added) + 1 == self.fail_on_add_call:
+            raise ValueError("vector store write failed")
+        self.added.append(list(contents))
+        return [f"id-{content}" for content in contents]
+    
+    async def search_many(self, user_id, query_embeddings, top_k):
+        self.searches.append((user_id, len(query_embeddings), top_k))
+        await asyncio.sleep(0)
+        if self.fail_search:
+            raise ValueError("vector store query failed")
+        return [{"user_id": user_id, "query": embedding.tolist()} for embedding in query_embeddings]
+
+
+class FakeEmbeddingGenerator:
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.batches = []
+    
+    async def generate_batch(self, texts):
+        self.batches.append(list(texts))
+        await asyncio.sleep(0)
+        if self.fail_on in texts:
+            raise RuntimeError("encoder failed")
+        return np.ones((len(texts), 3), dtype=np.float32)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(memory_service.settings, "EMBEDDING_CHUNK_SIZE", 2)
+    service = MemoryService.__new__(MemoryService)
+    service.vector_store = FakeVectorStore()
+    service.embedding_generator = FakeEmbeddingGenerator()
+    return service
+
+
+def memories(*contents):
+    return [MemoryCreate(content=content) for content in contents]
+
+
+class TestStoreMemories:
+    
+    def test_stores_all_chunks_in_order(self, service):
+        """Test that every chunk is written and ids come back in input order."""
+        stored = asyncio.run(service.store_memories("alice", memories("a", "b", "c", "d", "e")))
+        
+        assert service.vector_store.added == [["a", "b"], ["c", "d"], ["e"]]
+        assert [memory.id for memory in stored] == ["id-a", "id-b", "id-c", "id-d", "id-e"]
+    
+    def test_write_failure_raises_underlying_error(self, service):
+        """Test that a failed write surfaces its own exception and leaves earlier chunks stored."""
+        service.vector_store = FakeVectorStore(fail_on_add_call=2)
+        
+        with pytest.raises(ValueError, match="vector store write failed"):
+            asyncio.run(service.store_memories("alice", memories("a", "b", "c", "d", "e")))
+        
+        assert service.vector_store.added == [["a", "b"]]
+    
+    def test_embedding_failure_raises_underlying_error(self, service):
+        """Test that a failed embedding surfaces its own exception, not an ExceptionGroup."""
+        service.embedding_generator = FakeEmbeddingGenerator(fail_on="c")
+        
+        with pytest.raises(RuntimeError, match="encoder failed"):
+            asyncio.run(service.store_memories("alice", memories("a", "b", "c", "d")))
+    
+    def test_empty_input(self, service):
+        """Test that an empty list stores nothing."""
+        assert asyncio.run(service.store_memories("alice", [])) == []
+        assert service.vector_store.added == []
+
+
+@pytest.fixture
+def coalescer(monkeypatch):
+    monkeypatch.setattr(memory_service.settings, "RECALL_BATCH_WINDOW_MS", 20)
+    monkeypatch.setattr(memory_service.settings, "RECALL_MAX_BATCH", 32)
+    return RecallCoalescer()
+
+
+def recall(coalescer, store, user_id, value, top_k=5):
+    return coalescer.search(store, user_id, np.array([value], dtype=np.float32), top_k)
+
+
+class TestRecallCoalescer:
+    
+    def test_concurrent_recalls_share_one_query(self, coalescer):
+        """Test that concurrent recalls for one user become one search_many, each caller getting its own row."""
+        store = FakeVectorStore()
+        
+        async def main():
+            return await asyncio.gather(*(recall(coalescer, store, "alice", value) for value in range(3)))
+        
+        results = asyncio.run(main())
+        
+        assert store.searches == [("alice", 3, 5)]
+        assert [result["query"] for result in results] == [[0.0], [1.0], [2.0]]
+    
+    def test_users_and_top_k_batch_separately(self, coalescer):
+        """Test that recalls are only grouped with the same user and top_k."""
+        store = FakeVectorStore()
+        
+        async def main():
+            return await asyncio.gather(
+                recall(coalescer, store, "alice", 0),
+                recall(coalescer, store, "bob", 1),
+                recall(coalescer, store, "alice", 2, top_k=3),
+            )
+        
+        results = asyncio.run(main())
+        
+        assert sorted(store.searches) == [("alice", 1, 3), ("alice", 1, 5), ("bob", 1, 5)]
+        assert [(result["user_id"], result["query"]) for result in results] == [
+            ("alice", [0.0]), ("bob", [1.0]), ("alice", [2.0])
+        ]
+    
+    def test_full_batch_flushes_before_window(self, coalescer, monkeypatch):
+        """Test that reaching RECALL_MAX_BATCH flushes without waiting out the window."""
+        monkeypatch.setattr(memory_service.settings, "RECALL_BATCH_WINDOW_MS", 60_000)
+        monkeypatch.setattr(memory_service.settings, "RECALL_MAX_BATCH", 2)
+        store = FakeVectorStore()
+        
+        async def main():
+            return await asyncio.wait_for(
+                asyncio.gather(recall(coalescer, store, "alice", 0), recall(coalescer, store, "alice", 1)),
+                timeout=5
+            )
+        
+        results = asyncio.run(main())
+        
+        assert store.searches == [("alice", 2, 5)]
+        assert [result["query"] for result in results] == [[0.0], [1.0]]
+    
+    def test_stale_window_flush_leaves_next_batch(self, coalescer, monkeypatch):
+        """Test that a batch's window timer, firing after a size flush, doesn't touch the next batch."""
+        monkeypatch.setattr(memory_service.settings, "RECALL_MAX_BATCH", 2)
+        store = FakeVectorStore()
+        
+        async def main():
+            return await asyncio.gather(*(recall(coalescer, store, "alice", value) for value in range(3)))
+        
+        results = asyncio.run(main())
+        
+        assert store.searches == [("alice", 2, 5), ("alice", 1, 5)]
+        assert [result["query"] for result in results] == [[0.0], [1.0], [2.0]]
+    
+    def test_cancelled_caller_is_skipped(self, coalescer):
+        """Test that a caller cancelled mid-window doesn't break the flush for the others."""
+        store = FakeVectorStore()
+        
+        async def main():
+            cancelled = asyncio.create_task(recall(coalescer, store, "alice", 0))
+            waiting = asyncio.create_task(recall(coalescer, store, "alice", 1))
+            await asyncio.sleep(0)
+            flushes = list(coalescer._tasks)
+            cancelled.cancel()
+            
+            result = await waiting
+            await asyncio.gather(*flushes)
+            return cancelled, result
+        
+        cancelled, result = asyncio.run(main())
+        
+        assert cancelled.cancelled()
+        assert result["query"] == [1.0]
+        assert store.searches == [("alice", 2, 5)]
+    
+    def test_search_error_reaches_every_caller(self, coalescer):
+        """Test that a failed search_many is raised to each caller in the batch."""
+        store = FakeVectorStore()
+        store.fail_search = True
+        
+        async def main():
+            return await asyncio.gather(
+                recall(coalescer, store, "alice", 0),
+                recall(coalescer, store, "alice", 1),
+                return_exceptions=True
+            )
+        
+        errors = asyncio.run(main())
+        
+        assert [type(error) for error in errors] == [ValueError, ValueError]
+        assert store.searches == [("alice", 2, 5)]
+    
+    def test_flush_tasks_released_when_done(self, coalescer):
+        """Test that flush tasks are held while running and dropped once they finish."""
+        store = FakeVectorStore()
+        
+        async def main():
+            pending = asyncio.gather(recall(coalescer, store, "alice", 0), recall(coalescer, store, "alice", 1))
+            await asyncio.sleep(0)
+            held = len(coalescer._tasks)
+            await pending
+            await asyncio.sleep(0)
+            return held
+        
+        assert asyncio.run(main()) == 1
+        assert not coalescer._tasks
+        assert not coalescer._pending
+
+
+class TestRecallMemoriesBatch:
+    
+    def test_one_embedding_pass_and_one_query(self, service):
+        """Test that several mood contexts are embedded together and searched in one query."""
+        results = asyncio.run(service.recall_memories_batch("alice", ["sad", "tired"], top_k=3))
+        
+        assert service.embedding_generator.batches == [["sad", "tired"]]
+        assert service.vector_store.searches == [("alice", 2, 3)]
+        assert len(results) == 2
+    
+    def test_empty_input(self, service):
+        """Test that no mood contexts means no embedding or query."""
+        assert asyncio.run(service.recall_memories_batch("alice", [])) == []
+        assert service.embedding_generator.batches == []
+        assert service.vector_store.searches == []
@@ -0,0 +1,91 @@
+import pytest
+from src.services.memory import query_cache as query_cache_module
+from src.services.memory.query_cache import QueryCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(query_cache_module.time, "monotonic", clock)
+    return clock
+
+
+class TestQueryCache:
+    
+    def test_get_returns_cached_value(self, clock):
+        """Test that a stored value is returned for the same user and key."""
+        cache = QueryCache(max_size=4, ttl=10)
+        cache.put("alice", "k", {"ids": [["1"]]})
+        
+        assert cache.get("alice", "k") == {"ids": [["1"]]}
+        assert cache.get("bob", "k") is None
+        assert cache.get("alice", "other") is None
+    
+    def test_entries_expire_after_ttl(self, clock):
+        """Test that an entry is served until its TTL passes, then dropped."""
+        cache = QueryCache(max_size=4, ttl=10)
+        cache.put("alice", "k", "value")
+        
+        clock.now += 9.9
+        assert cache.get("alice", "k") == "value"
+        
+        clock.now += 0.2
+        assert cache.get("alice", "k") is None
+        assert len(cache._entries) == 0
+    
+    def test_put_refreshes_ttl(self, clock):
+        """Test that re-putting a key restarts its TTL."""
+        cache = QueryCache(max_size=4, ttl=10)
+        cache.put("alice", "k", "old")
+        clock.now += 8
+        cache.put("alice", "k", "new")
+        clock.now += 8
+        
+        assert cache.get("alice", "k") == "new"
+    
+    def test_evicts_least_recently_used(self, clock):
+        """Test that the least recently used entry is evicted first, counting reads as use."""
+        cache = QueryCache(max_size=3, ttl=10)
+        cache.put("alice", "a", 1)
+        cache.put("alice", "b", 2)
+        cache.put("bob", "c", 3)
+        
+        cache.get("alice", "a")
+        cache.put("bob", "d", 4)
+        
+        assert cache.get("alice", "b") is None
+        assert cache.get("alice", "a") == 1
+        assert cache.get("bob", "c") == 3
+        assert cache.get("bob", "d") == 4
+    
+    def test_invalidate_user_only_drops_that_user(self, clock):
+        """Test that invalidate_user clears one user's entries and leaves the rest."""
+        cache = QueryCache(max_size=10, ttl=10)
+        cache.put("alice", "a", 1)
+        cache.put("alice", "b", 2)
+        cache.put("bob", "a", 3)
+        
+        cache.invalidate_user("alice")
+        
+        assert cache.get("alice", "a") is None
+        assert cache.get("alice", "b") is None
+        assert cache.get("bob", "a") == 3
+    
+    def test_clear(self, clock):
+        """Test that clear drops every entry."""
+        cache = QueryCache(max_size=10, ttl=10)
+        cache.put("alice", "a", 1)
+        cache.put("bob", "a", 2)
+        
+        cache.clear()
+        
+        assert cache.get("alice", "a") is None
+        assert cache.get("bob", "a") is None
@@ -0,0 +1,386 @@
+import pytest
+from datetime import date, datetime, timedelta
+
+pytest.importorskip("psycopg2")
+
+from src.services.database import relational_database_service as rds
+from src.services.database.relational_database_service import (
+    PreparingConnection,
+    RelationalDatabaseService,
+)
+
+
+class FakeCursor:
+    """Records executed SQL; mogrify inlines parameters with repr()."""
+    
+    def __init__(self, connection):
+        self.connection = connection
+        self.executed = []
+        self.description = None
+        self.rows = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+    
+    def mogrify(self, query, params):
+        if isinstance(query, bytes):
+            query = query.decode()
+        return (query % tuple(repr(p) for p in params)).encode()
+    
+    def execute(self, query, params=None):
+        self.executed.append((query, params))
+        self.connection.executed.append((query, params))
+        if self.connection.fail_on and self.connection.fail_on in str(query):
+            raise RuntimeError("query failed")
+    
+    def fetchall(self):
+        return self.rows
+    
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+
+class FakeConnection:
+    def __init__(self):
+        self.prepared = set()
+        self.encoding = "UTF8"
+        self.closed = 0
+        self.executed = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.fail_on = None
+        self.cursors = []
+        self.rows = []
+    
+    def cursor(self, cursor_factory=None):
+        cursor = FakeCursor(self)
+        cursor.rows = self.rows
+        cursor.description = [("column",)] if self.rows else None
+        self.cursors.append(cursor)
+        return cursor
+    
+    def commit(self):
+        self.commits += 1
+    
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class FakePool:
+    """Hands out connections round-robin and records putconn calls."""
+    
+    def __init__(self, minconn, maxconn, connection_factory=None, **db_config):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.connection_factory = connection_factory
+        self.db_config = db_config
+        self.connections = [FakeConnection()]
+        self.next = 0
+        self.returned = []
+        self.closed_all = False
+    
+    def getconn(self):
+        connection = self.connections[self.next % len(self.connections)]
+        self.next += 1
+        return connection
+    
+    def putconn(self, connection, close=False):
+        self.returned.append((connection, close))
+    
+    def closeall(self):
+        self.closed_all = True
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """Service over a fake connection pool."""
+    monkeypatch.setattr(rds.pool, "ThreadedConnectionPool", FakePool)
+    service = RelationalDatabaseService({"host": "localhost", "database": "test"},
+                                        min_connections=2, max_connections=5)
+    yield service
+    service.close()
+
+
+@pytest.fixture
+def connection(db):
+    return db.pool.connections[0]
+
+
+class TestConnectionPool:
+    
+    def test_pool_created_with_limits_and_factory(self, db):
+        """Test that the pool gets the configured size and the preparing connection class."""
+        assert db.pool.minconn == 2
+        assert db.pool.maxconn == 5
+        assert db.pool.connection_factory is PreparingConnection
+        assert db.pool.db_config == {"host": "localhost", "database": "test"}
+    
+    def test_get_cursor_commits_and_returns_connection(self, db, connection):
+        """Test that a successful block commits and hands the connection back to the pool."""
+        with db.get_cursor() as cursor:
+            cursor.execute("SELECT 1;")
+        
+        assert connection.commits == 1
+        assert connection.rollbacks == 0
+        assert db.pool.returned == [(connection, False)]
+    
+    def test_get_cursor_rolls_back_and_reraises(self, db, connection):
+        """Test that an error rolls back, propagates, and still returns the connection."""
+        with pytest.raises(ValueError):
+            with db.get_cursor():
+                raise ValueError("boom")
+        
+        assert connection.commits == 0
+        assert connection.rollbacks == 1
+        assert db.pool.returned == [(connection, False)]
+    
+    def test_broken_connection_is_closed_by_pool(self, db, connection):
+        """Test that a connection that has dropped is discarded rather than reused."""
+        connection.closed = 2
+        
+        with db.get_cursor() as cursor:
+            cursor.execute("SELECT 1;")
+        
+        assert db.pool.returned == [(connection, True)]
+    
+    def test_close_closes_all_connections(self, db):
+        """Test that close() shuts the pool down once."""
+        pool = db.pool
+        
+        db.close()
+        db.close()
+        
+        assert pool.closed_all
+        assert db.pool is None
+
+
+class TestBulkChatHistory:
+    
+    def test_bulk_insert_pages_rows(self, db, connection):
+        """Test that execute_values sends one multi-row INSERT per page."""
+        rows = [(1, f"2024-01-01 00:00:{i:02d}", f"message {i}") for i in range(5)]
+        
+        inserted = db.add_chat_history_bulk(rows, page_size=2)
+        
+        assert inserted == 5
+        statements = [query.decode() for query, _ in connection.executed]
+        assert len(statements) == 3
+        assert all(s.strip().startswith("INSERT INTO chat_history") for s in statements)
+        assert "'message 0'" in statements[0] and "'message 1'" in statements[0]
+        assert "'message 4'" in statements[2]
+        assert connection.commits == 1
+    
+    def test_bulk_insert_empty_skips_database(self, db, connection):
+        """Test that an empty batch never checks out a connection."""
+        assert db.add_chat_history_bulk([]) == 0
+        assert connection.executed == []
+        assert db.pool.returned == []
+
+
+class TestPreparedStatements:
+    
+    def test_prepared_statements_list_columns(self):
+        """Test that no prepared statement selects *, so ALTER TABLE can't break cached plans."""
+        for _, statement in rds.PREPARED_STATEMENTS.values():
+            assert "*" not in statement
+    
+    def test_first_use_prepares_then_executes(self, db, connection):
+        """Test that a statement is PREPAREd lazily before its first EXECUTE."""
+        connection.rows = [{"user_id": 7, "user_name": "Ada"}]
+        
+        result = db.get_user_by_id(7)
+        
+        assert result == {"user_id": 7, "user_name": "Ada"}
+        (prepare, _), (execute, params) = connection.executed
+        assert prepare.startswith("PREPARE get_user_by_id (integer) AS SELECT user_id,")
+        assert execute == "EXECUTE get_user_by_id (%s);"
+        assert params == (7,)
+        assert connection.prepared == {"get_user_by_id"}
+    
+    def test_second_use_only_executes(self, db, connection):
+        """Test that a connection reuses its prepared statement."""
+        db.get_user_by_id(1)
+        connection.executed.clear()
+        
+        assert db.get_user_by_id(2) is None
+        
+        assert connection.executed == [("EXECUTE get_user_by_id (%s);", (2,))]
+    
+    def test_each_connection_prepares_its_own(self, db):
+        """Test that prepared state is tracked per pooled connection."""
+        first, second = db.pool.connections = [FakeConnection(), FakeConnection()]
+        
+        db.get_mood_by_date(1, "2024-01-01")
+        db.get_mood_by_date(1, "2024-01-02")
+        
+        for connection in (first, second):
+            assert connection.executed[0][0].startswith("PREPARE get_mood_by_date (integer, date)")
+            assert connection.prepared == {"get_mood_by_date"}
+    
+    def test_failed_prepare_is_retried(self, db, connection):
+        """Test that a PREPARE that errors isn't recorded, so the next call prepares again."""
+        connection.fail_on = "PREPARE"
+        with pytest.raises(RuntimeError):
+            db.get_user_by_email("ada@example.com")
+        assert connection.prepared == set()
+        assert connection.rollbacks == 1
+        
+        connection.fail_on = None
+        connection.executed.clear()
+        db.get_user_by_email("ada@example.com")
+        
+        assert connection.executed[0][0].startswith("PREPARE get_user_by_email (varchar)")
+        assert connection.executed[1] == ("EXECUTE get_user_by_email (%s);", ("ada@example.com",))
+    
+    def test_insert_returns_no_rows(self, db, connection):
+        """Test that a prepared INSERT passes its parameters through EXECUTE."""
+        assert db.add_chat_history(1, "hello", time_stamp="2024-01-01 10:00:00")
+        assert connection.executed[1] == (
+            "EXECUTE add_chat_history (%s, %s, %s);", (1, "2024-01-01 10:00:00", "hello")
+        )
+    
+    def test_chat_history_range_uses_plain_query(self, db, connection):
+        """Test that date-filtered history falls back to the unprepared range query."""
+        db.get_chat_history_by_user(3, start_date="2024-01-01")
+        
+        assert connection.executed == [
+            (rds.CHAT_HISTORY_QUERIES[(True, False)], (3, "2024-01-01"))
+        ]
+        assert connection.prepared == set()
+    
+    def test_chat_history_without_range_is_prepared(self, db, connection):
+        """Test that unfiltered history goes through the prepared statement."""
+        db.get_chat_history_by_user(3)
+        
+        assert connection.executed[-1] == ("EXECUTE get_chat_history_by_user (%s);", (3,))
+
+
+class TestRecordTurn:
+    
+    def test_turn_is_one_statement_batch(self, db, connection):
+        """Test that both messages go out in a single execute, reply just after the message."""
+        sent = datetime(2024, 3, 5, 9, 30)
+        message, reply = "I feel low", "I'm here with you"
+        
+        assert db.record_turn(4, message, reply, time_stamp=sent)
+        
+        (batch, params), = connection.executed
+        assert params is None
+        sql = batch.decode()
+        assert sql.count("INSERT INTO chat_history") == 1
+        assert "INSERT INTO mood" not in sql
+        values = (f"(4, {sent!r}, {message!r}), "
+                  f"(4, {sent + timedelta(microseconds=1)!r}, {reply!r})")
+        assert values in sql
+        assert connection.commits == 1
+    
+    def test_turn_with_mood_appends_upsert(self, db, connection):
+        """Test that a mood value adds the upsert, keyed by the turn's date, to the same batch."""
+        sent = datetime(2024, 3, 5, 23, 59)
+        
+        db.record_turn(4, "better now", "glad to hear", average_mood=6.5, time_stamp=sent)
+        
+        (batch, _), = connection.executed
+        sql = batch.decode()
+        chat, mood = sql.split("INSERT INTO mood")
+        assert "INSERT INTO chat_history" in chat
+        assert f"VALUES (4, {sent.date()!r}, 6.5)" in mood
+        assert "ON CONFLICT (user_id, date)" in mood
+    
+    def test_failed_turn_rolls_back_both_rows(self, db, connection):
+        """Test that an error in the batch rolls back the whole turn."""
+        connection.fail_on = "INSERT"
+        
+        with pytest.raises(RuntimeError):
+            db.record_turn(4, "hi", "hello", average_mood=5.0)
+        
+        assert connection.commits == 0
+        assert connection.rollbacks == 1
+
+
+class TestChatHistoryJson:
+    
+    def test_json_queries_wrap_range_queries(self):
+        """Test that each JSON query aggregates the matching range query, newest first."""
+        for key, query in rds.CHAT_HISTORY_JSON_QUERIES.items():
+            assert f"FROM ({rds.CHAT_HISTORY_QUERIES[key]}) t" in query
+            assert "json_agg(t ORDER BY t.time_stamp DESC)" in query
+            assert "'[]'::json" in query
+    
+    @pytest.mark.parametrize("start,end,key,params", [
+        (None, None, (False, False), (9,)),
+        ("2024-01-01", None, (True, False), (9, "2024-01-01")),
+        (None, "2024-02-01", (False, True), (9, "2024-02-01")),
+        ("2024-01-01", "2024-02-01", (True, True), (9, "2024-01-01", "2024-02-01")),
+    ])
+    def test_json_history_filters(self, db, connection, start, end, key, params):
+        """Test that the optional bounds pick the right query and parameter order."""
+        connection.rows = [{"history": '[{"chat_content": "hi"}]'}]
+        
+        result = db.get_chat_history_json(9, start_date=start, end_date=end)
+        
+        assert result == '[{"chat_content": "hi"}]'
+        assert connection.executed == [(rds.CHAT_HISTORY_JSON_QUERIES[key], params)]
+
+
+class TestAverageMoodRange:
+    
+    @pytest.mark.parametrize("start,end,full_start,full_end", [
+        # Inside one month: no whole month, everything comes from daily rows
+        (date(2024, 3, 5), date(2024, 3, 20), date(2024, 4, 1), date(2024, 3, 1)),
+        # Starts on the 1st but stops mid-month
+        (date(2024, 3, 1), date(2024, 3, 20), date(2024, 3, 1), date(2024, 3, 1)),
+        # Ends on the last day but starts mid-month
+        (date(2024, 3, 5), date(2024, 3, 31), date(2024, 4, 1), date(2024, 4, 1)),
+        # Exactly one calendar month
+        (date(2024, 3, 1), date(2024, 3, 31), date(2024, 3, 1), date(2024, 4, 1)),
+        # Partial months at both edges around whole ones
+        (date(2024, 1, 15), date(2024, 4, 10), date(2024, 2, 1), date(2024, 4, 1)),
+        # Year rollover
+        (date(2023, 12, 15), date(2024, 1, 31), date(2024, 1, 1), date(2024, 2, 1)),
+        # Month-end on leap and non-leap Februaries
+        (date(2024, 2, 1), date(2024, 2, 29), date(2024, 2, 1), date(2024, 3, 1)),
+        (date(2023, 2, 1), date(2023, 2, 28), date(2023, 2, 1), date(2023, 3, 1)),
+        (date(2024, 2, 1), date(2024, 2, 28), date(2024, 2, 1), date(2024, 2, 1)),
+        # Single day
+        (date(2024, 5, 1), date(2024, 5, 1), date(2024, 5, 1), date(2024, 5, 1)),
+    ])
+    def test_full_month_bounds(self, start, end, full_start, full_end):
+        """Test the whole-month window read from the rollup for month-edge cases."""
+        assert rds._full_month_bounds(start, end) == (full_start, full_end)
+    
+    def test_query_text_and_parameters(self, db, connection):
+        """Test that the rollup and edge halves get the computed window and the raw range."""
+        connection.rows = [{"avg_mood": 6.25}]
+        
+        result = db.get_average_mood_range(2, date(2024, 1, 15), date(2024, 4, 10))
+        
+        assert result == 6.25
+        (query, params), = connection.executed
+        assert query == rds.AVERAGE_MOOD_RANGE
+        assert "FROM mood_rollup_monthly" in query
+        assert "month >= %(full_start)s AND month < %(full_end)s" in query
+        assert "date BETWEEN %(start_date)s AND %(end_date)s" in query
+        assert "NOT (date >= %(full_start)s AND date < %(full_end)s)" in query
+        assert params == {
+            "user_id": 2,
+            "start_date": date(2024, 1, 15),
+            "end_date": date(2024, 4, 10),
+            "full_start": date(2024, 2, 1),
+            "full_end": date(2024, 4, 1),
+        }
+    
+    def test_zero_average_is_not_dropped(self, db, connection):
+        """Test that an average of 0 is returned rather than treated as no data."""
+        connection.rows = [{"avg_mood": 0.0}]
+        
+        assert db.get_average_mood_range(2, date(2024, 1, 1), date(2024, 1, 31)) == 0.0
+    
+    def test_no_data_returns_none(self, db, connection):
+        """Test that an empty range returns None."""
+        connection.rows = [{"avg_mood": None}]
+        
+        assert db.get_average_mood_range(2, date(2024, 1, 1), date(2024, 1, 31)) is None
@@ -0,0 +1,122 @@
+import asyncio
+import pytest
+
+pytest.importorskip("chromadb")
+
+from src.services.memory import vector_store
+from src.services.memory.vector_store import VectorStore, query_cache
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """VectorStore over an embedded Chroma in tmp_path, recording Chroma calls."""
+    monkeypatch.setenv("ANONYMIZED_TELEMETRY", "False")
+    monkeypatch.setattr(vector_store.settings, "CHROMA_MODE", "persistent")
+    monkeypatch.setattr(vector_store.settings, "CHROMA_PERSIST_DIR", str(tmp_path / "chroma"))
+    vector_store._chroma_client.cache_clear()
+    vector_store._collections.clear()
+    query_cache.clear()
+    
+    calls = []
+    run_chroma = vector_store._run_chroma
+    
+    async def recording_run_chroma(func, *args, **kwargs):
+        calls.append(func.__name__)
+        return await run_chroma(func, *args, **kwargs)
+    
+    monkeypatch.setattr(vector_store, "_run_chroma", recording_run_chroma)
+    store = VectorStore()
+    store.calls = calls
+    yield store
+    
+    vector_store._chroma_client.cache_clear()
+    vector_store._collections.clear()
+    query_cache.clear()
+
+
+def add(store, user_id, content, embedding):
+    return asyncio.run(store.add(user_id, content, embedding, {"mood_score": 8}))
+
+
+def search(store, user_id, embedding, top_k=5):
+    return asyncio.run(store.search(user_id, embedding, top_k))
+
+
+class TestSearchCache:
+    
+    def test_repeat_search_served_from_cache(self, store):
+        """Test that an identical search for the same user skips Chroma."""
+        add(store, "alice", "beach day", [1.0, 0.0, 0.0])
+        store.calls.clear()
+        
+        first = search(store, "alice", [1.0, 0.0, 0.0])
+        second = search(store, "alice", [1.0, 0.0, 0.0])
+        
+        assert first == second
+        assert first["documents"] == [["beach day"]]
+        assert store.calls.count("query") == 1
+    
+    def test_add_invalidates_user_cache(self, store):
+        """Test that writing a memory drops that user's cached searches."""
+        add(store, "alice", "beach day", [1.0, 0.0, 0.0])
+        search(store, "alice", [1.0, 0.0, 0.0])
+        
+        add(store, "alice", "mountain hike", [0.9, 0.1, 0.0])
+        result = search(store, "alice", [1.0, 0.0, 0.0])
+        
+        assert sorted(result["documents"][0]) == ["beach day", "mountain hike"]
+        assert store.calls.count("query") == 2
+    
+    def test_add_keeps_other_users_cache(self, store):
+        """Test that one user's write leaves other users' cached searches in place."""
+        add(store, "alice", "beach day", [1.0, 0.0, 0.0])
+        add(store, "bob", "concert", [0.0, 1.0, 0.0])
+        search(store, "bob", [0.0, 1.0, 0.0])
+        
+        add(store, "alice", "mountain hike", [0.9, 0.1, 0.0])
+        store.calls.clear()
+        result = search(store, "bob", [0.0, 1.0, 0.0])
+        
+        assert result["documents"] == [["concert"]]
+        assert "query" not in store.calls
+    
+    def test_delete_invalidates_user_cache(self, store):
+        """Test that deleting a memory drops that user's cached searches."""
+        memory_id = add(store, "alice", "beach day", [1.0, 0.0, 0.0])
+        search(store, "alice", [1.0, 0.0, 0.0])
+        
+        assert asyncio.run(store.delete("alice", memory_id))
+        result = search(store, "alice", [1.0, 0.0, 0.0])
+        
+        assert result["documents"] == [[]]
+
+
+class TestCollections:
+    
+    def test_search_for_new_user_creates_nothing(self, store):
+        """Test that reading for a user with no memories returns empty results without a collection."""
+        result = search(store, "nobody", [1.0, 0.0, 0.0])
+        
+        assert result["ids"] == [[]]
+        assert result["documents"] == [[]]
+        assert store.client.list_collections() == []
+        assert not asyncio.run(store.delete("nobody", "missing-id"))
+        assert store.client.list_collections() == []
+    
+    def test_collections_shared_across_instances(self, store):
+        """Test that a VectorStore built for a later request reuses the opened collection."""
+        add(store, "alice", "beach day", [1.0, 0.0, 0.0])
+        store.calls.clear()
+        
+        later = VectorStore()
+        asyncio.run(later.search("alice", [0.0, 1.0, 0.0]))
+        
+        assert "_open_collection" not in store.calls
+        assert store.calls == ["query"]
+    
+    def test_hashed_name_for_invalid_user_id(self, store):
+        """Test that user ids that aren't valid collection names still get their own collection."""
+        add(store, "a@b c", "beach day", [1.0, 0.0, 0.0])
+        
+        assert search(store, "a@b c", [1.0, 0.0, 0.0])["documents"] == [["beach day"]]
+        assert search(store, "a_b_c", [1.0, 0.0, 0.0])["documents"] == [[]]